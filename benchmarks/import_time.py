@@ -0,0 +1,59 @@
+import argparse
+import os
+import subprocess
+import sys
+
+__author__ = 'Usiel'
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['benders_auction', 'benders_auction.solver', 'benders_auction.auction', 'benders_auction.batch']
+# loaded on first solve, never on import
+HEAVY_MODULES = ['gurobipy', 'numpy']
+
+PROBE = """
+import sys, time
+start = time.time()
+import %s
+print time.time() - start
+print ' '.join(name for name in %r if name in sys.modules)
+"""
+
+
+def measure(module, repetitions):
+    """
+    Imports module in fresh interpreters.
+    :param module: Module to import.
+    :param repetitions: Number of interpreters started.
+    :return: Returns (median import time in seconds, heavy modules loaded by the import).
+    """
+    times = []
+    loaded = set()
+    for i in range(0, repetitions):
+        output = subprocess.check_output([sys.executable, '-c', PROBE % (module, HEAVY_MODULES)], cwd=ROOT)
+        lines = output.split('\n')
+        times.append(float(lines[0]))
+        loaded.update(lines[1].split())
+    return sorted(times)[len(times) / 2], sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Guards the time it takes to import the package.')
+    parser.add_argument('--limit', type=float, default=0.15, help='maximal median import time in seconds')
+    parser.add_argument('--repetitions', type=int, default=5, help='interpreters started per module')
+    arguments = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        median, loaded = measure(module, arguments.repetitions)
+        problems = []
+        if median > arguments.limit:
+            problems.append('slower than %.0fms' % (arguments.limit * 1000))
+        if loaded:
+            problems.append('loads %s' % ', '.join(loaded))
+        failed = failed or bool(problems)
+        print '%-28s %7.1fms  %s' % (module, median * 1000, '; '.join(problems) if problems else 'ok')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+from benders_auction.agent import ManualAgent, RandomizedAgent, BundleAgent, QueryCache
+from benders_auction.auction import Auction, AscendingAuction, PrimalDualAuction
+from benders_auction.common import Valuation, Assignment, Allocation, ConsoleLogger, BlackHoleLogger, make_bundle
+from benders_auction.dw_solver import DwSolver
+from benders_auction.lagrangian import LagrangianSolver
+from benders_auction.population import AgentPopulation, load_population, write_population, \
+    generate_randomized_population
+from benders_auction.sampling import LotterySampler
+from benders_auction.solver import BendersSolver, OptimalSolver, LaviSwamyGreedyApproximator, \
+    NisanGreedyDemandApproximator
+
+__author__ = 'Usiel'
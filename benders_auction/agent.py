@@ -0,0 +1,244 @@
+import itertools
+import math
+import pprint
+import threading
+from collections import OrderedDict
+
+from benders_auction.backends import np
+from benders_auction.common import Valuation, epsilon, bundle_cost
+
+__author__ = 'Usiel'
+
+
+def next_agent_id():
+    next_agent_id.counter += 1
+    return next_agent_id.counter
+
+
+next_agent_id.counter = 0
+
+
+class QueryCache:
+    def __init__(self, size=4096):
+        """
+        QueryCache remembers answers of an agent (least recently used are evicted first).
+        :param size: Maximal number of answers kept.
+        """
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        queries = self.hits + self.misses
+        return float(self.hits) / queries if queries else 0.
+
+    def lookup(self, key):
+        """
+        :param key: (query type, arguments...).
+        :return: Returns (True, answer) if key is known, else (False, None).
+        """
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            answer = self.entries.pop(key)
+            self.entries[key] = answer
+            return True, answer
+
+    def store(self, key, answer):
+        with self.lock:
+            self.entries[key] = answer
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key, calculate):
+        """
+        :param key: (query type, arguments...).
+        :param calculate: Function calculating the answer if key is not known.
+        :return: Returns (cached) answer.
+        """
+        known, answer = self.lookup(key)
+        if not known:
+            answer = calculate()
+            self.store(key, answer)
+        return answer
+
+
+def summarize_cache_statistics(agents):
+    """
+    :param agents: List of agents (agents without cache are ignored).
+    :return: Returns (hits, misses, evictions) summed over all agents.
+    """
+    caches = [agent.cache for agent in agents if hasattr(agent, 'cache')]
+    return sum(cache.hits for cache in caches), sum(cache.misses for cache in caches), \
+        sum(cache.evictions for cache in caches)
+
+
+class ManualAgent:
+    def __init__(self, valuations, identifier=None, cache_size=4096):
+        """
+        :param valuations: List of Valuation.
+        :param identifier: Optional identifier (unique).
+        :param cache_size: Number of query answers remembered (see QueryCache).
+        """
+        self.id = identifier if identifier >= 0 else next_agent_id()
+        self.valuations = valuations
+        # print 'Agent %s:' % self.id
+        # for v in self.valuations:
+        #     print 'v(%s)=%s' % (v.quantity, v.valuation)
+        self.cache = QueryCache(cache_size)
+
+    def query_demand(self, price, left_supply, base_price):
+        return self.cache.get(('demand', price, left_supply), lambda: self.calculate_demand(price, left_supply))
+
+    def calculate_demand(self, price, left_supply):
+        best_valuation = None
+        best_utility = None
+        for valuation in self.valuations:
+            if valuation.quantity <= left_supply:
+                utility = (self.calculate_utility(price, valuation))
+                if utility >= -epsilon and utility >= best_utility:
+                    best_valuation = valuation
+                    best_utility = utility
+        return best_valuation
+
+    def query_relative_demand(self, price, left_supply, base_price):
+        """
+        Returns quantity and valuation for this quantity, which maximizes the agent's utility. \
+        Real demand query would only return j. We can however simulate a value query for j with mt demand queries.
+        :param price: Current price-per-item.
+        :param left_supply: Supply available at the moment.
+        :return: Returns Valuation if utility > 0, else None.
+        """
+        return self.cache.get(('relative_demand', price, left_supply),
+                              lambda: self.calculate_relative_demand(price, left_supply))
+
+    def calculate_relative_demand(self, price, left_supply):
+        best_valuation = None
+        best_utility = None
+        for valuation in self.valuations:
+            if valuation.quantity <= left_supply:
+                utility = (self.calculate_utility(price, valuation)) / valuation.quantity
+                if utility > 0 and utility >= best_utility:
+                    best_valuation = valuation
+                    best_utility = utility
+        return best_valuation
+
+    def query_relative_marginal_demand(self, price, quantity_owned, left_supply):
+        pass
+
+    def marginal_value_query(self, additional_quantity, quantity_owned):
+        return self.cache.get(('marginal_value', additional_quantity, quantity_owned),
+                              lambda: self.calculate_marginal_value(additional_quantity, quantity_owned))
+
+    def calculate_marginal_value(self, additional_quantity, quantity_owned):
+        quantity_owned_value = next(valuation.valuation for valuation in self.valuations if
+                                    valuation.quantity == quantity_owned) if quantity_owned > 0 else 0.
+        try:
+            combined_quantity_value = next(valuation.valuation for valuation in self.valuations if
+                                           valuation.quantity == quantity_owned + additional_quantity)
+        except StopIteration:
+            combined_quantity_value = 0.
+        return combined_quantity_value - quantity_owned_value
+
+    def query_value(self, quantity):
+        """
+        Returns valuation for a certain quantity. Should be simulated by demand queries at later stage.
+        :param quantity: Quantity we want to know valuation for.
+        :return: Returns Valuation or None (if not defined).
+        """
+        return self.cache.get(('value', quantity), lambda: self.calculate_value(quantity))
+
+    def calculate_value(self, quantity):
+        valuation = itertools.ifilter(lambda x: x.quantity == quantity, self.valuations).next()
+        if valuation:
+            return valuation
+        return None
+
+    def introduce_yourself(self):
+        print 'I am Agent %s' % self.id
+        for valuation in self.valuations:
+            print 'v(%s)=%s | ' % (valuation.quantity, valuation.valuation),
+        print ''
+        print ''
+
+    def query_demand_set(self, price, left_supply):
+        return self.cache.get(('demand_set', price, left_supply),
+                              lambda: self.calculate_demand_set(price, left_supply))
+
+    def calculate_demand_set(self, price, left_supply):
+        valid_valuations = [valuation for valuation in self.valuations if valuation.quantity <= left_supply]
+        max_valuations = {valuation for valuation in valid_valuations
+                          if (self.calculate_utility(price, valuation)) + epsilon >= max(
+            (self.calculate_utility(price, v)) for v in valid_valuations) and self.calculate_utility(price, valuation) + epsilon >= 0}
+        return max_valuations
+
+    def calculate_utility(self, price, valuation):
+        return valuation.valuation - valuation.quantity * price
+
+
+class RandomizedAgent(ManualAgent):
+    def __init__(self, supply, identifier=None):
+        """
+        RandomizedAgent uses a distribution to pick random valuations. v_i(j) is non-decreasing for increasing j.
+        :param supply: Supply available in auction (needed for valuation generation).
+        :param identifier: Optional identifier (unique).
+        """
+        valuations = []
+        for i in range(1, supply + 1):
+            previous_valuation = 0
+            if i > 1:
+                previous_valuation = valuations[i - 2].valuation
+            valuations.append(Valuation(i, math.floor(previous_valuation + np.random.exponential(5.0))))
+
+        ManualAgent.__init__(self, valuations, identifier)
+
+
+class BundleAgent(ManualAgent):
+    def __init__(self, valuations, identifier=None, cache_size=4096):
+        """
+        BundleAgent bids on bundles of several item types. Only the bundles bid on are stored, each as a sparse \
+        quantity vector (see make_bundle), so answering a query costs as much as the agent's nonzeros.
+        :param valuations: List of Valuation with bundles as quantities.
+        :param identifier: Optional identifier (unique).
+        :param cache_size: Number of query answers remembered (see QueryCache).
+        """
+        ManualAgent.__init__(self, valuations, identifier, cache_size)
+        self.values = dict((valuation.quantity, valuation) for valuation in valuations)
+        # only prices of these items change the answer of query_bundle_demands
+        self.items = sorted(set(item for valuation in valuations for item, count in valuation.quantity))
+
+    def query_bundle_demands(self, prices, utility):
+        """
+        :param prices: Dict(item: price).
+        :param utility: Utility the agent is guaranteed anyway.
+        :return: Returns list of Valuation of all bundles with positive value after prices and utility.
+        """
+        return self.cache.get(('bundle_demands', tuple(prices[item] for item in self.items), utility),
+                              lambda: self.calculate_bundle_demands(prices, utility))
+
+    def calculate_bundle_demands(self, prices, utility):
+        return [valuation for valuation in self.valuations
+                if valuation.valuation - utility - bundle_cost(prices, valuation.quantity) > 0]
+
+    def calculate_value(self, quantity):
+        return self.values.get(quantity)
+
+
+def generate_randomized_agents(supply, agents_count):
+    """
+    Generates randomized agents.
+    :param supply: Supply up for auction.
+    :param agents_count: Agents to generate.
+    :return:
+    """
+    agents = [RandomizedAgent(supply) for i in range(0, agents_count)]
+    for agent in agents:
+        agent.introduce_yourself()
+    return agents
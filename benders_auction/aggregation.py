@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from fractions import Fraction
+
+from benders_auction.common import Assignment, Allocation
+from benders_auction.population import exposes_valuations, agent_bids
+
+__author__ = 'Usiel'
+
+
+class AgentClass:
+    def __init__(self, members):
+        """
+        AgentClass stands for several agents submitting identical valuations. Solvers treat it like a single agent \
+        with a multiplicity, i.e. its constraints are scaled by the number of members.
+        :param members: List of agents with identical valuations (non-empty).
+        """
+        self.members = members
+        self.representative = members[0]
+        self.id = self.representative.id
+
+    @property
+    def multiplicity(self):
+        return len(self.members)
+
+    @property
+    def valuations(self):
+        return self.representative.valuations
+
+    def without_member(self):
+        """
+        :return: Returns AgentClass with one member less or None if this was the last one.
+        """
+        if self.multiplicity == 1:
+            return None
+        return AgentClass(self.members[:-1])
+
+    @property
+    def concurrent(self):
+        return getattr(self.representative, 'concurrent', False)
+
+    def submit(self, method, *args):
+        return self.representative.submit(method, *args)
+
+    def query_demand(self, price, left_supply, base_price):
+        return self.representative.query_demand(price, left_supply, base_price)
+
+    def query_relative_demand(self, price, left_supply, base_price):
+        return self.representative.query_relative_demand(price, left_supply, base_price)
+
+    def query_demand_set(self, price, left_supply):
+        return self.representative.query_demand_set(price, left_supply)
+
+    def marginal_value_query(self, additional_quantity, quantity_owned):
+        return self.representative.marginal_value_query(additional_quantity, quantity_owned)
+
+    def query_value(self, quantity):
+        return self.representative.query_value(quantity)
+
+    def query_bundle_demands(self, prices, utility):
+        return self.representative.query_bundle_demands(prices, utility)
+
+    def calculate_utility(self, price, valuation):
+        return self.representative.calculate_utility(price, valuation)
+
+
+def valuation_key(agent):
+    """
+    :param agent: Agent.
+    :return: Returns hashable key identifying the agent's valuations (None if agent does not expose them).
+    """
+    if not exposes_valuations(agent):
+        return None
+    return tuple(zip(*agent_bids(agent)))
+
+
+def aggregate_agents(agents):
+    """
+    Groups agents with identical valuations into classes. Agents not exposing valuations form a class on their own.
+    :param agents: List of agents.
+    :return: Returns list of AgentClass (in order of first appearance).
+    """
+    classes = []
+    members = dict()
+    for agent in agents:
+        key = valuation_key(agent)
+        if key is None:
+            classes.append([agent])
+        elif key in members:
+            members[key].append(agent)
+        else:
+            members[key] = [agent]
+            classes.append(members[key])
+    return [AgentClass(class_members) for class_members in classes]
+
+
+def expand_allocations(allocations, classes):
+    """
+    Expands allocations over classes into allocations over the single agents. Members of a class are \
+    interchangeable, so the positions of every class are rotated through its members with equal probability: \
+    rotation r of a class with m members covers [r/m, (r+1)/m) of the allocation's probability. Rotations of all \
+    classes are combined along this interval, so an allocation over classes of m_1, ..., m_k members expands into \
+    at most m_1 + ... + m_k allocations (not their product). Thus identical agents end up with identical lotteries.
+    :param allocations: Dict of Allocation (class ids as agent ids).
+    :param classes: List of AgentClass.
+    :return: Returns dict of Allocation over the single agents.
+    """
+    classes_by_id = dict((agent_class.id, agent_class) for agent_class in classes)
+    expanded = dict()
+    for name, allocation in allocations.iteritems():
+        # one position per member receiving something
+        positions_by_class = OrderedDict()
+        for assignment in allocation.assignments:
+            positions_by_class.setdefault(assignment.agent_id, []).extend([assignment] * assignment.count)
+
+        # rotations change where any class moves on to its next rotation
+        breakpoints = [Fraction(0), Fraction(1)]
+        if allocation.probability:
+            breakpoints = sorted(set(Fraction(rotation, classes_by_id[class_id].multiplicity)
+                                     for class_id in positions_by_class
+                                     for rotation in range(0, classes_by_id[class_id].multiplicity + 1)) |
+                                 set(breakpoints))
+
+        pieces = zip(breakpoints, breakpoints[1:])
+        for index, (start, end) in enumerate(pieces):
+            assignments = []
+            for class_id, positions in positions_by_class.iteritems():
+                members = classes_by_id[class_id].members
+                rotation = int(start * len(members))
+                for position, assignment in enumerate(positions):
+                    member = members[(position + rotation) % len(members)]
+                    assignments.append(Assignment(assignment.quantity, member.id, assignment.valuation))
+            probability = allocation.probability * float(end - start) if allocation.probability \
+                else allocation.probability
+            expanded[name if len(pieces) == 1 else '%s.%s' % (name, index)] = Allocation(assignments, probability)
+    return expanded
@@ -0,0 +1,413 @@
+import copy
+import math
+import pprint
+import itertools
+
+from benders_auction.backends import gp
+
+from benders_auction.agent import summarize_cache_statistics
+from benders_auction.common import epsilon, Valuation, ConsoleLogger, BlackHoleLogger
+from benders_auction.aggregation import aggregate_agents
+from benders_auction.lagrangian import LagrangianSolver
+from benders_auction.model_pool import model_pool
+from benders_auction.population import exposes_valuations
+from benders_auction.preprocessing import ValuationPreprocessor, BidderScreen
+from benders_auction.remote import gather_queries
+from benders_auction.solver import BendersSolver, LaviSwamyGreedyApproximator, OptimalSolver, \
+    NisanGreedyDemandApproximator
+
+__author__ = 'Usiel'
+
+
+class Auction:
+    def __init__(self, supply, agents, log=ConsoleLogger(), approximator=LaviSwamyGreedyApproximator, cache=None):
+        """
+        :param supply: Number of copies of identical item.
+        :param agents: List of agents (or AgentPopulation) to participate. Need to implement query_demand(.) and \
+        query_value(.).
+        :param approximator: Approximator class used for the economy and all marginal economies.
+        :param cache: Optional SolutionCache consulted before any economy is solved.
+        """
+        if isinstance(supply, dict):
+            # VCG prices on a heuristic lottery are not truthful in expectation
+            raise ValueError('several item types are solved heuristically, use BendersSolver without VCG prices')
+        self.supply = supply
+        # agents are compressed once, so all marginal economies share the compressed agents
+        self.preprocessor = ValuationPreprocessor(agents, log)
+        self.agents = self.preprocessor.agents
+        # screened agents win nothing and pay nothing, they need neither a variable nor a marginal economy
+        self.screen = BidderScreen(self.agents, self.supply, log)
+        self.approximator = approximator
+        self.solver = BendersSolver(self.supply,
+                                    self.screen.agents,
+                                    approximator(self.supply, self.screen.agents, log),
+                                    log,
+                                    screen=False)
+        # number of agents screened summed over all marginal economies
+        self.marginal_screened = 0
+        self.allocations = None
+        self.expected_price = dict()
+        self.log = log
+        self.cache = cache
+
+    def solve(self, solver):
+        """
+        :param solver: BendersSolver of an economy.
+        :return: Returns (dict of Allocation, E[social welfare]).
+        """
+        if self.cache:
+            return self.cache.solve(solver)
+        allocations = solver.solve()
+        return allocations, -solver.objective
+
+    def start_auction(self):
+        allocations, optimal_with_agent = self.solve(self.solver)
+        self.allocations = allocations
+
+        for agent in self.screen.screened:
+            self.expected_price[agent.id] = 0.
+
+        # members of a class are interchangeable, so one marginal economy per class is enough
+        classes = aggregate_agents(self.screen.agents)
+        for agent_class in classes:
+            excluded_agent = agent_class.members[-1]
+            # without the excluded agent the price may drop, so agents screened before may win now
+            marginal_screen = BidderScreen([a for a in self.agents if a != excluded_agent], self.supply)
+            self.marginal_screened += len(marginal_screen.screened)
+            other_agents = marginal_screen.agents
+            solver = BendersSolver(self.supply, other_agents,
+                                   self.approximator(
+                                       self.supply,
+                                       other_agents,
+                                       BlackHoleLogger()),
+                                   BlackHoleLogger(),
+                                   screen=False)
+            allocations_without_agent, optimal_without_agent = self.solve(solver)
+            # the next marginal economy has the same width and reuses the master problem
+            solver.release()
+
+            for agent in agent_class.members:
+                other_agents_valuations = sum([allocation.get_expected_social_welfare_without_agent(agent.id)
+                                               for allocation in allocations.itervalues()])
+
+                vcg_payoff = optimal_with_agent - optimal_without_agent
+                vcg_price = optimal_without_agent - other_agents_valuations
+
+                self.expected_price[agent.id] = vcg_price
+
+                print 'Marginal Economy - Sum V-1 = %s - %s = %s' % (
+                optimal_without_agent, other_agents_valuations, self.expected_price[agent.id])
+
+        for price in self.expected_price.iteritems():
+            self.log.log('Agent %s has expected VCG price %s' % (price[0], price[1]))
+        self.log.log('Screening: %s of %s agents screened, %s marginal economies solved (%s agents screened in them)'
+                     % (len(self.screen.screened), len(self.agents), len(classes),
+                        self.marginal_screened))
+        self.print_cache_statistics()
+        model_pool().print_report(self.log)
+        if self.cache:
+            self.cache.print_report(self.log)
+
+    def print_cache_statistics(self):
+        # marginal economies ask the shared agents many questions of the main economy again
+        hits, misses, evictions = summarize_cache_statistics(self.agents)
+        if hits + misses:
+            self.log.log('Query cache: %s hits, %s misses (%.1f%% hit rate), %s evictions' % (
+                hits, misses, 100. * hits / (hits + misses), evictions))
+
+    def calculate_social_welfare(self, allocations):
+        return sum([allocation.expected_social_welfare for allocation in allocations.itervalues()])
+
+
+class AscendingAuction:
+    def __init__(self, supply, agents, log=ConsoleLogger(), pool=None, lagrangian=True):
+        """
+        :param supply: Number of copies of identical item.
+        :param agents: List of agents (or AgentPopulation) to participate. Need to implement query_demand(.) and \
+        query_value(.).
+        :param pool: Optional ShardedAgentPool holding the agents, each clock step is then queried in parallel.
+        :param lagrangian: If True and all agents expose valuations, the clock starts just below the LP price found \
+        by LagrangianSolver instead of at 0.
+        """
+        self.supply = supply
+        self.preprocessor = ValuationPreprocessor(agents, log)
+        self.agents = self.preprocessor.agents
+        self.expected_price = {key.id: None for key in self.agents}
+        self.marginal_economies = {key.id: None for key in self.agents}
+        self.log = log
+        self.marginal_economies = {key.id: None for key in self.agents}
+        self.step_size = 0.05
+        self.pool = pool
+        self.price = None
+        self.lagrangian = lagrangian
+        self.skipped_steps = 0
+
+    def start_price(self):
+        """
+        Demand only drops below supply around the LP price, so all clock steps below it can be skipped. The start is \
+        checked to still be overdemanded, otherwise the clock starts at 0.
+        :return: Returns price the clock starts at (one step below the first price queried).
+        """
+        if not self.lagrangian or any(not exposes_valuations(agent) for agent in self.agents):
+            return 0.
+        steps = max(0, int(LagrangianSolver(self.supply, self.agents).price / self.step_size) - 1)
+        if steps == 0 or self.get_total_demand_at_price(steps * self.step_size) < self.supply:
+            return 0.
+        self.skipped_steps = steps
+        self.log.log('Clock starts at %s (%s steps skipped)' % (steps * self.step_size, steps))
+        return steps * self.step_size
+
+    def start_auction(self):
+        p = self.start_price()
+        total_demand = None
+        while total_demand is None or total_demand >= self.supply:
+            p += self.step_size
+            total_demand = 0
+            if self.pool:
+                total_demand = self.get_total_demand_at_price(p)
+            else:
+                demands, total_demand, min_coeff = self.get_demands_at_price(p, self.agents)
+        if self.pool:
+            # the clock only needs the workers' totals, demand sets of the single agents are built once at the end
+            demands, total_demand, min_coeff = self.get_demands_at_price(p, self.agents)
+
+            # now check if without agent i, is there still overdemand?
+            # for agent in self.agents:
+            #     # check if we already know vcg price
+            #     if self.marginal_economies[agent.id] is None:
+            #         marginal_agents = [copy.copy(a) for a in self.agents if agent != a]
+            #         marginal_demands, total_marginal_demands, marginal_min_coeff = self.get_demands_at_price(p - self.step_size,
+            #                                                                              marginal_agents)
+            #         if total_marginal_demands <= self.supply:
+            #             print 'p=%s agent %s out' % (p - self.step_size, agent.id)
+            #             marginal_agents = self.get_agents_with_relevant_valuations(marginal_agents, marginal_demands)
+            #             marginal_solver = BendersSolver(self.supply,
+            #                                             marginal_agents,
+            #                                             LaviSwamyGreedyApproximator(self.supply, marginal_agents,
+            #                                                                         BlackHoleLogger()),
+            #                                             BlackHoleLogger())
+            #             marginal_solver.solve()
+            #             self.marginal_economies[agent.id] = -marginal_solver.objective
+
+        non_marginal_bidders = [agent for agent in self.agents if agent.id in [demand[0] for demand in demands.iteritems() if demand[1]]]
+        marginal_bidders = [agent for agent in self.agents if agent not in non_marginal_bidders]
+        p -= self.step_size
+        self.price = p
+        non_marginal_demands, non_marginal_total_demand, non_marginal_min_coeff = self.get_demands_at_price(p, non_marginal_bidders)
+        marginal_demands, marginal_total_demand, marginal_min_coeff = self.get_demands_at_price(p, marginal_bidders)
+
+        marginal_coeff = (self.supply - non_marginal_total_demand) / marginal_total_demand if marginal_total_demand > 0 else 0
+        marginal_total_demand = marginal_coeff * marginal_total_demand
+        for agent_id in marginal_demands:
+            marginal_demands[agent_id] = {Valuation(demand.quantity * marginal_coeff, demand.valuation * marginal_coeff) for demand in marginal_demands[agent_id]}
+        print marginal_coeff
+        z = marginal_demands.copy()
+        z.update(non_marginal_demands)
+        demands = z
+        total_demand = marginal_total_demand + non_marginal_total_demand
+
+        return self.calculate_fractional_assignments(demands, total_demand, min_coeff, self.agents)
+        print p
+
+        # for agent_demand in demands.iteritems():
+        #     for demand in agent_demand[1]:
+        #         print 'p=%s , D_%s(%s)=%s' % (p, agent_demand[0], p, demand.quantity)
+        # print 'D(%s)=%s' % (p, total_demand)
+        #
+        # agents_with_relevant_valuations = self.get_agents_with_relevant_valuations(self.agents, demands)
+        #
+        # solver = BendersSolver(self.supply,
+        #                        agents_with_relevant_valuations,
+        #                        LaviSwamyGreedyApproximator(self.supply, agents_with_relevant_valuations, self.log),
+        #                        self.log)
+        # allocations = solver.solve()
+        #
+        # for agent in self.agents:
+        #     other_agents_valuations = sum([allocation.get_expected_social_welfare_without_agent(agent.id)
+        #                                    for allocation in allocations.itervalues()])
+        #     # if marginal economy exists, otherwise use full economy (can happen, if agent i does not drop out
+        #     marginal_economy = self.marginal_economies[agent.id] if self.marginal_economies[agent.id] else -solver.objective
+        #     self.expected_price[agent.id] = marginal_economy  - other_agents_valuations
+        #
+        # for price in self.expected_price.iteritems():
+        #     self.log.log('Agent %s has expected VCG price %s' % (price[0], price[1]))
+        #
+        # OptimalSolver(supp, agents_with_relevant_valuations, 2, False)
+
+    def get_demands_at_price(self, price, agents):
+        total_demand = 0
+        demands = {key.id: [] for key in agents}
+        min_demands = {key.id: 0. for key in agents}
+        max_demands = {key.id: 0. for key in agents}
+        for agent, demand_set in zip(agents, self.get_demand_sets(price, agents)):
+            demands[agent.id] = demand_set
+            if demands[agent.id]:
+                min_demands[agent.id] = min(demand.quantity for demand in demands[agent.id])
+                max_demands[agent.id] = max(demand.quantity for demand in demands[agent.id])
+        sum_max_demands = sum(max_demands.itervalues())
+        sum_diff = sum(min_demands[agent.id] - max_demands[agent.id] for agent in agents)
+        min_coeff = (self.supply - sum_max_demands) / sum_diff if sum_diff != 0 else 1
+        if min_coeff < 1.:
+            total_demand = sum(min_demands[agent.id] * min_coeff + max_demands[agent.id] * (1 - min_coeff) for agent in agents)
+        else:
+            total_demand = sum(min_demands.itervalues())
+
+        #self.calculate_fractional_assignments(demands, total_demand, min_coeff, agents)
+        return demands, total_demand, min_coeff
+
+    def get_total_demand_at_price(self, price):
+        """
+        Same total as get_demands_at_price over all agents. With a pool it is computed from the totals of the \
+        workers, so a clock step costs no per-agent work in this process.
+        :param price: Current price.
+        :return: Returns total demand.
+        """
+        if not self.pool:
+            return self.get_demands_at_price(price, self.agents)[1]
+        demand_round = self.pool.query_demands(price, self.supply)
+        sum_diff = float(demand_round.total_min_demand - demand_round.total_max_demand)
+        min_coeff = (self.supply - demand_round.total_max_demand) / sum_diff if sum_diff != 0 else 1
+        if min_coeff < 1.:
+            return demand_round.total_min_demand * min_coeff + demand_round.total_max_demand * (1 - min_coeff)
+        return demand_round.total_min_demand
+
+    def get_demand_sets(self, price, agents):
+        """
+        :param price: Current price.
+        :param agents: Agents to ask.
+        :return: Returns list of demand sets, the pool only reports the smallest and largest bundle of each set.
+        """
+        if not self.pool:
+            return gather_queries([(agent, 'query_demand_set', (price, self.supply)) for agent in agents])
+
+        demand_round = self.pool.query_demands(price, self.supply)
+        demand_sets = []
+        for agent in agents:
+            i = self.pool.index[agent.id]
+            quantities = {demand_round.min_quantities[i], demand_round.max_quantities[i]}
+            demand_sets.append({Valuation(int(quantity), float(self.pool.value(agent.id, quantity)))
+                                for quantity in quantities if quantity > 0})
+        return demand_sets
+
+    def get_agents_with_relevant_valuations(self, agents, demands):
+        agents_copy = copy.deepcopy(agents)
+        for agent in agents_copy:
+            for val in agent.valuations:
+                if not any(demand.quantity == val.quantity for demand in demands[agent.id]):
+                    val.valuation = 0
+        return agents_copy
+
+    def calculate_fractional_assignments(self, demands, total_demand, min_coeff, agents):
+        sw = 0.
+        for agent in agents:
+            try:
+                if demands[agent.id]:
+                    min_demand = min(demands[agent.id], key = lambda d: d.quantity)
+                    max_demand = max(demands[agent.id], key = lambda d: d.quantity)
+                    print 'Agent %s gets %s items: %s' % (agent.id, min_demand.quantity, min_coeff)
+                    print 'Agent %s gets %s items: %s' % (agent.id, max_demand.quantity, (1.-min_coeff))
+                    valuation = min_demand.valuation * min_coeff + max_demand.valuation * (1.-min_coeff)
+                    print 'Valuation for this agent: %s' % valuation
+                    sw += valuation
+            except KeyError:
+                pass
+        print sw
+        return sw
+
+class PrimalDualAuction:
+    def __init__(self, supply, agents, log=ConsoleLogger()):
+        """
+        :param supply: Number of copies of identical item.
+        :param agents: List of agents (or AgentPopulation) to participate. Need to implement query_demand(.) and \
+        query_value(.).
+        """
+        self.supply = supply
+        self.preprocessor = ValuationPreprocessor(agents, log)
+        self.agents = self.preprocessor.agents
+        self.expected_price = {key.id: None for key in self.agents}
+        self.marginal_economies = {key.id: None for key in self.agents}
+        self.log = log
+        self.marginal_economies = {key.id: None for key in self.agents}
+        self.step_size = 0.1
+        self.obj = 0.
+        self.price = None
+
+    def start_auction(self):
+        p = 0.
+        total_demand = None
+        status = gp.GRB.INFEASIBLE
+        m = None
+        while status == gp.GRB.INFEASIBLE: #total_demand is None or total_demand >= self.supply:
+            p += self.step_size
+            total_demand = 0
+            demands = self.get_demands_at_price(p, self.agents)
+            demands_next = self.get_demands_at_price(p + epsilon, self.agents)
+            # every step solves a restricted primal of the same shape, so the model of the last step is reused
+            model_pool().release(m)
+            m = self.solve_restricted_primal(demands, demands_next, p)
+
+            status = m.status
+            print p
+        self.price = p
+        objective = m.getObjective().getValue()
+        model_pool().release(m)
+        model_pool().print_report(self.log)
+        return objective
+
+    def solve_restricted_primal(self, demands, demands_next, p):
+        self.obj = 0.
+        keys = [(agent.id, i) for agent in self.agents for i in range(1, self.supply + 1)]
+        m, variables = model_pool().acquire("multi-unit-auction", [(0., 1., 'x_%s_%s' % key) for key in keys])
+        # self.m.params.LogToConsole = 0
+        self.allocation_vars = dict(zip(keys, variables))
+        for agent in self.agents:
+            if len(demands[agent.id]) > 0 and len(demands_next[agent.id]) > 0:
+                m.addConstr(gp.quicksum(self.allocation_vars[agent.id, i] for i in range(1, self.supply + 1)),
+                                 gp.GRB.EQUAL, 1, name="u_%s_strict" % agent.id)
+            else:
+                m.addConstr(gp.quicksum(self.allocation_vars[agent.id, i] for i in range(1, self.supply + 1)),
+                                 gp.GRB.LESS_EQUAL, 1, name="u_%s" % agent.id)
+            for j in range(1, self.supply + 1):
+                if j not in [demand.quantity for demand in demands[agent.id]]:
+                    m.addConstr(self.allocation_vars[agent.id, j], gp.GRB.EQUAL, 0, name='x_%s_%s_undemanded' % (agent.id, j))
+
+        if p > 0:
+            m.addConstr(
+                gp.quicksum(self.allocation_vars[agent.id, i] * i for i in range(1, self.supply + 1) for agent in self.agents),
+                gp.GRB.EQUAL, self.supply, name="price_strict")
+        else:
+            m.addConstr(
+                gp.quicksum(self.allocation_vars[agent.id, i] * i for i in range(1, self.supply + 1) for agent in self.agents),
+                gp.GRB.LESS_EQUAL, self.supply, name="price")
+        obj_expr = gp.LinExpr()
+        for agent in self.agents:
+            for valuation in agent.valuations:
+                obj_expr.addTerms(valuation.quantity, self.allocation_vars[agent.id, valuation.quantity])
+        m.setObjective(obj_expr, gp.GRB.MAXIMIZE)
+        m.update()
+        m.optimize()
+
+        m.write('optimal-lp.lp')
+
+        if m.status == gp.GRB.OPTIMAL:
+            m.write('optimal-lp.sol')
+            for v in [v for v in m.getVars() if v.x != 0.]:
+                print('%s %g' % (v.varName, v.x))
+
+            print ''
+            print 'CONSTRAINTS:'
+
+            for l in m.getConstrs():
+                if l.Pi > 0:
+                    print('%s %g' % (l.constrName, l.Pi))
+
+            print m.getObjective().getValue()
+
+        return m
+
+    def get_demands_at_price(self, price, agents):
+        demands = {key.id: [] for key in agents}
+        demand_sets = gather_queries([(agent, 'query_demand_set', (price, self.supply)) for agent in agents])
+        for agent, demand_set in zip(agents, demand_sets):
+            demands[agent.id] = demand_set
+        return demands
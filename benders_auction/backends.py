@@ -0,0 +1,27 @@
+import importlib
+
+__author__ = 'Usiel'
+
+
+class LazyModule:
+    def __init__(self, name):
+        """
+        LazyModule stands in for a heavy module (LP solver, numpy) and imports it on first attribute access, so \
+        importing this package stays cheap for code paths which never solve.
+        :param name: Name of module to import.
+        """
+        self.name = name
+        self.module = None
+
+    @property
+    def loaded(self):
+        return self.module is not None
+
+    def __getattr__(self, attribute):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attribute)
+
+
+gp = LazyModule('gurobipy')
+np = LazyModule('numpy')
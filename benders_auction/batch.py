@@ -0,0 +1,238 @@
+import argparse
+import json
+import multiprocessing
+import os
+import Queue
+import sys
+import time
+
+from benders_auction.backends import gp
+
+from benders_auction.agent import ManualAgent, BundleAgent
+from benders_auction.auction import Auction, AscendingAuction, PrimalDualAuction
+from benders_auction.common import Valuation, BlackHoleLogger, make_bundle
+from benders_auction.dw_solver import DwSolver
+from benders_auction.lagrangian import LagrangianSolver
+from benders_auction.model_pool import model_pool
+from benders_auction.population import load_population, as_agents
+from benders_auction.solution_cache import SolutionCache
+from benders_auction.solver import BendersSolver, LaviSwamyGreedyApproximator, NisanGreedyDemandApproximator
+
+__author__ = 'Usiel'
+
+MECHANISMS = ['benders', 'dw', 'ascending', 'primal-dual', 'lagrangian']
+APPROXIMATORS = {'lavi-swamy': LaviSwamyGreedyApproximator, 'nisan': NisanGreedyDemandApproximator}
+
+# SolutionCache of a worker process (see initialize_worker)
+worker_cache = None
+
+
+def parse_agents(instance):
+    """
+    :param instance: Decoded instance, either 'agents': [{'id': 0, 'valuations': [[quantity, value], ...]}, ...] \
+    or 'population': path of a file written by write_population. With several items a quantity is a dict \
+    (item: quantity) and the agent bids on bundles.
+    :return: Returns list of agents.
+    """
+    if 'population' in instance:
+        return as_agents(load_population(instance['population']))
+    if any(isinstance(quantity, dict) for agent in instance['agents'] for quantity, value in agent['valuations']):
+        return [BundleAgent([Valuation(make_bundle(quantity), float(value)) for quantity, value in agent['valuations']],
+                            agent['id']) for agent in instance['agents']]
+    return [ManualAgent([Valuation(int(quantity), float(value)) for quantity, value in agent['valuations']],
+                        agent['id']) for agent in instance['agents']]
+
+
+def encode_allocations(allocations):
+    """
+    :param allocations: Dict of Allocation.
+    :return: Returns JSON serializable list of allocations drawn with positive probability.
+    """
+    return [{'name': str(name),
+             'probability': allocation.probability,
+             'assignments': [[assignment.agent_id, assignment.quantity, assignment.valuation]
+                             for assignment in allocation.assignments]}
+            for name, allocation in sorted(allocations.iteritems()) if allocation.probability]
+
+
+def solve_instance(instance, cache=None):
+    """
+    :param instance: Decoded instance with supply, agents, mechanism (see MECHANISMS), approximator (see \
+    APPROXIMATORS) and for Benders optionally vcg (default True), time_budget and target_gap. A supply given as \
+    dict (item: supply) is solved by Benders with lavi-swamy heuristically (marked heuristic, no VCG prices).
+    :param cache: Optional SolutionCache for Benders economies.
+    :return: Returns result dict (allocations, welfare, prices where the mechanism provides them, converged unless a \
+    Benders solve was stopped early).
+    """
+    mechanism = instance.get('mechanism', 'benders')
+    supply = instance['supply']
+    approximator = APPROXIMATORS[instance.get('approximator', 'lavi-swamy')]
+    if isinstance(supply, dict) and mechanism != 'benders':
+        raise ValueError('mechanism %s only supports a single item' % mechanism)
+    agents = parse_agents(instance)
+    # all mechanisms but Benders run to the end
+    result = {'mechanism': mechanism, 'converged': True}
+    allocations = None
+
+    if isinstance(supply, dict):
+        result['heuristic'] = True
+
+    if mechanism == 'benders' and instance.get('vcg', not isinstance(supply, dict)):
+        auction = Auction(supply, agents, BlackHoleLogger(), approximator, cache)
+        auction.start_auction()
+        allocations = auction.allocations
+        result['prices'] = auction.expected_price
+        result['converged'] = auction.solver.converged
+        auction.solver.release()
+    elif mechanism == 'benders':
+        solver = BendersSolver(supply, agents, approximator(supply, agents, BlackHoleLogger()), BlackHoleLogger())
+        if cache:
+            allocations, welfare = cache.solve(solver, instance.get('time_budget'), instance.get('target_gap'))
+        else:
+            allocations = solver.solve(instance.get('time_budget'), instance.get('target_gap'))
+        # a cached solution comes with its bounds
+        result['gap'] = solver.gap
+        result['converged'] = solver.converged
+        solver.release()
+    elif mechanism == 'dw':
+        solver = DwSolver(agents, supply, approximator=approximator)
+        while solver.iterate():
+            pass
+        solver.set_allocation_probabilities()
+        allocations = solver.allocations
+    elif mechanism == 'ascending':
+        auction = AscendingAuction(supply, agents, BlackHoleLogger())
+        result['welfare'] = auction.start_auction()
+        result['price'] = auction.price
+    elif mechanism == 'primal-dual':
+        auction = PrimalDualAuction(supply, agents, BlackHoleLogger())
+        result['welfare'] = auction.start_auction()
+        result['price'] = auction.price
+    elif mechanism == 'lagrangian':
+        solver = LagrangianSolver(supply, agents)
+        result['welfare'] = solver.objective
+        result['price'] = solver.price
+        result['utilities'] = solver.utilities.items()
+        result['fractional_allocation'] = [[agent_id, quantity, x] for (agent_id, quantity), x
+                                           in sorted(solver.allocation.iteritems())]
+    else:
+        raise ValueError('unknown mechanism %s (one of %s)' % (mechanism, ', '.join(MECHANISMS)))
+
+    if allocations is not None:
+        result['allocations'] = encode_allocations(allocations)
+        result['welfare'] = sum(allocation.expected_social_welfare for allocation in allocations.itervalues())
+    return result
+
+
+def initialize_worker(cache_directory=None, cache_bytes=None):
+    global worker_cache
+    # solvers report on stdout (also from within gurobi), results only travel back through the pool
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    if cache_directory:
+        worker_cache = SolutionCache(cache_directory, cache_bytes)
+    # the gurobi environment is set up once per worker instead of once per instance, models are pooled per worker
+    try:
+        model, variables = model_pool().acquire('warm-up')
+        model_pool().release(model)
+    except gp.GurobiError:
+        pass
+
+
+def solve_line(task):
+    """
+    :param task: (sequence number, JSON line).
+    :return: Returns (sequence number, JSON result line), errors are reported in the result.
+    """
+    sequence, line = task
+    start = time.time()
+    identifier = sequence
+    try:
+        instance = json.loads(line)
+        identifier = instance.get('id', sequence)
+        result = solve_instance(instance, worker_cache)
+        result['status'] = 'ok'
+    except Exception as e:
+        result = {'status': 'error', 'error': '%s: %s' % (type(e).__name__, e)}
+
+    def finish(result):
+        result['id'] = identifier
+        result['timings'] = {'solve': time.time() - start}
+        # counters of the worker's model pool (cumulative over its instances)
+        pool = model_pool()
+        result['model_pool'] = {'hits': pool.hits, 'misses': pool.misses, 'saved': pool.time_saved}
+        return sequence, json.dumps(result)
+    # an exception would never reach run_batch (the pool callback only fires on success), so it would wait forever
+    try:
+        return finish(result)
+    except Exception as e:
+        return finish({'status': 'error', 'error': 'result not serializable: %s: %s' % (type(e).__name__, e)})
+
+
+def run_batch(lines, workers=None, window=None, ordered=True, cache_directory=None,
+              cache_bytes=256 * 1024 * 1024):
+    """
+    Solves instances in a pool of long-lived worker processes. At most window instances are read ahead of the \
+    results written, so memory stays bounded for arbitrarily long streams.
+    :param lines: Iterable of JSON lines (one instance each).
+    :param workers: Number of worker processes (default is number of cores).
+    :param window: Maximal number of instances in flight (default is 4 per worker).
+    :param ordered: If True results come in input order, else in completion order.
+    :param cache_directory: Optional directory of a SolutionCache shared by all workers.
+    :param cache_bytes: Size of the cache.
+    :return: Returns generator of JSON result lines.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    window = window or 4 * workers
+    pool = multiprocessing.Pool(workers, initialize_worker, (cache_directory, cache_bytes))
+    finished = Queue.Queue()
+    done = dict()
+    lines = iter(lines)
+    exhausted = False
+    submitted = 0
+    emitted = 0
+    try:
+        while True:
+            while not exhausted and submitted - emitted < window:
+                line = next(lines, None)
+                if line is None:
+                    exhausted = True
+                elif line.strip():
+                    pool.apply_async(solve_line, ((submitted, line),), callback=finished.put)
+                    submitted += 1
+            if emitted == submitted:
+                break
+
+            sequence, output = finished.get()
+            done[sequence] = output
+            if not ordered:
+                yield done.pop(sequence)
+                emitted += 1
+            while emitted in done:
+                yield done.pop(emitted)
+                emitted += 1
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solves auction instances given as JSON lines.')
+    parser.add_argument('input', nargs='?', default='-', help='JSONL file with instances (default stdin)')
+    parser.add_argument('-o', '--output', default='-', help='JSONL file for results (default stdout)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--window', type=int, default=None, help='maximal number of instances in flight')
+    parser.add_argument('--unordered', action='store_true', help='write results in completion order')
+    parser.add_argument('--cache', default=None, help='directory of a cache of solved economies')
+    parser.add_argument('--cache-size', type=int, default=256, help='size of the cache in MB')
+    arguments = parser.parse_args()
+
+    source = sys.stdin if arguments.input == '-' else open(arguments.input)
+    target = sys.stdout if arguments.output == '-' else open(arguments.output, 'w')
+    for output in run_batch(source, arguments.workers, arguments.window, not arguments.unordered,
+                            arguments.cache, arguments.cache_size * 1024 * 1024):
+        target.write(output + '\n')
+        target.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import json
+import os
+from collections import OrderedDict
+
+from benders_auction.backends import np
+from benders_auction.common import Assignment, Allocation
+
+__author__ = 'Usiel'
+
+SNAPSHOT_VERSION = 1
+
+
+def encode_allocations(allocations):
+    """
+    :param allocations: Dict of Allocation.
+    :return: Returns dict of arrays (allocation i holds the assignments offsets[i] to offsets[i+1]-1). Bundles of \
+    several items are stored as JSON strings.
+    """
+    names = list(allocations)
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(allocations[name].assignments))
+    assignments = [assignment for name in names for assignment in allocations[name].assignments]
+    return {'allocation_names': np.array([str(name) for name in names]),
+            'allocation_probabilities': np.array([allocations[name].probability or 0. for name in names]),
+            'allocation_offsets': np.array(offsets, dtype=np.int64),
+            'assignment_agents': np.array([assignment.agent_id for assignment in assignments]),
+            'assignment_quantities': np.array([encode_quantity(assignment.quantity) for assignment in assignments]
+                                              if any(isinstance(assignment.quantity, tuple)
+                                                     for assignment in assignments)
+                                              else [assignment.quantity for assignment in assignments]),
+            'assignment_valuations': np.array([assignment.valuation for assignment in assignments],
+                                              dtype=np.float64),
+            'assignment_counts': np.array([assignment.count for assignment in assignments], dtype=np.int64)}
+
+
+def decode_allocations(arrays):
+    """
+    :param arrays: Arrays as written by encode_allocations.
+    :return: Returns OrderedDict of Allocation (names as strings).
+    """
+    allocations = OrderedDict()
+    offsets = arrays['allocation_offsets']
+    agents = arrays['assignment_agents'].tolist()
+    quantities = [decode_quantity(quantity) for quantity in arrays['assignment_quantities'].tolist()]
+    valuations = arrays['assignment_valuations'].tolist()
+    # snapshots written before class members were counted hold one assignment per member
+    counts = arrays['assignment_counts'].tolist() if 'assignment_counts' in arrays else [1] * len(agents)
+    for index, name in enumerate(arrays['allocation_names'].tolist()):
+        assignments = [Assignment(quantities[i], agents[i], valuations[i], counts[i])
+                       for i in range(offsets[index], offsets[index + 1])]
+        allocations[name] = Allocation(assignments, float(arrays['allocation_probabilities'][index]))
+    return allocations
+
+
+def encode_quantity(quantity):
+    return json.dumps(quantity)
+
+
+def decode_quantity(quantity):
+    """
+    :param quantity: Quantity as stored by encode_allocations.
+    :return: Returns quantity or bundle (sorted (item, quantity) pairs).
+    """
+    if isinstance(quantity, basestring):
+        return tuple((item, count) for item, count in json.loads(quantity))
+    return quantity
+
+
+def write_snapshot(path, kind, meta, arrays):
+    """
+    Writes a snapshot atomically, a crash while writing leaves the previous snapshot intact.
+    :param path: File to write.
+    :param kind: Solver the snapshot belongs to ('benders' or 'dw').
+    :param meta: JSON serializable dict (counters, names).
+    :param arrays: Dict of arrays.
+    """
+    meta = dict(meta, kind=kind, version=SNAPSHOT_VERSION)
+    temporary = '%s.%s.tmp' % (path, os.getpid())
+    with open(temporary, 'wb') as output:
+        np.savez_compressed(output, meta=np.array(json.dumps(meta)), **arrays)
+    os.rename(temporary, path)
+
+
+def read_snapshot(path, kind):
+    """
+    :param path: File written by write_snapshot.
+    :param kind: Solver expected to have written the snapshot.
+    :return: Returns (meta, dict of arrays).
+    """
+    with np.load(path) as data:
+        arrays = dict((name, data[name]) for name in data.files)
+    meta = json.loads(arrays.pop('meta').item())
+    if meta.get('kind') != kind or meta.get('version') != SNAPSHOT_VERSION:
+        raise ValueError('%s is not a version %s snapshot of a %s solver' % (path, SNAPSHOT_VERSION, kind))
+    return meta, arrays
+
+
+def revalue_allocation(allocation, agents_by_id, supply):
+    """
+    Adapts an allocation of a snapshot to a modified instance. Assignments of agents no longer present (or of \
+    bundles no longer bid on) are dropped, all others get the agent's current valuation. Dropping assignments keeps \
+    an allocation feasible.
+    :param allocation: Allocation from snapshot.
+    :param agents_by_id: Dict of current agents (or classes).
+    :param supply: Current supply (dict(item: supply) if there are several items).
+    :return: Returns Allocation (without probability) or None if nothing is left or supply is exceeded.
+    """
+    assignments = []
+    assigned = dict()
+    for assignment in allocation.assignments:
+        agent = agents_by_id.get(assignment.agent_id)
+        count = min(assignment.count, getattr(agent, 'multiplicity', 1) - assigned.get(assignment.agent_id, 0))
+        if agent is None or count <= 0:
+            continue
+        try:
+            valuation = agent.query_value(assignment.quantity)
+        except StopIteration:
+            valuation = None
+        if valuation is None or not valuation.quantity:
+            continue
+        assigned[agent.id] = assigned.get(agent.id, 0) + count
+        assignments.append(Assignment(valuation.quantity, agent.id, valuation.valuation, count))
+
+    allocation = Allocation(assignments)
+    if not assignments or not allocation.fits(supply):
+        return None
+    return allocation
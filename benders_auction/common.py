@@ -0,0 +1,170 @@
+import math
+
+__author__ = 'Usiel'
+
+
+def make_bundle(quantities):
+    """
+    :param quantities: Dict(item: quantity).
+    :return: Returns bundle, the sparse quantity vector of several item types: sorted (item, quantity) pairs \
+    (positive quantities only).
+    """
+    return tuple(sorted((item, quantity) for item, quantity in quantities.iteritems() if quantity > 0))
+
+
+def bundle_items(quantity):
+    """
+    :param quantity: Quantity of the single item or bundle.
+    :return: Returns (item, quantity) pairs, the single item is None.
+    """
+    return quantity if isinstance(quantity, tuple) else ((None, quantity),)
+
+
+def item_supply(supply):
+    """
+    :param supply: Supply of the single item or dict(item: supply).
+    :return: Returns dict(item: supply), the single item is None.
+    """
+    return supply if isinstance(supply, dict) else {None: supply}
+
+
+def bundle_cost(price, quantity):
+    """
+    :param price: Price of the single item or dict(item: price).
+    :param quantity: Quantity of the single item or bundle.
+    :return: Returns price of quantity.
+    """
+    if isinstance(quantity, tuple):
+        return sum(price[item] * count for item, count in quantity)
+    return price * quantity
+
+
+def fits(quantity, supply):
+    """
+    :param quantity: Quantity of the single item or bundle.
+    :param supply: Supply of the single item or dict(item: supply).
+    :return: Returns True if quantity does not exceed supply of any item.
+    """
+    supplies = item_supply(supply)
+    return all(count <= supplies.get(item, 0) for item, count in bundle_items(quantity))
+
+
+def bundle_name(quantity):
+    """
+    :return: Returns quantity as it may appear in variable names (e.g. A2_B1 for a bundle).
+    """
+    if isinstance(quantity, tuple):
+        return '_'.join('%s%s' % (item, count) for item, count in quantity)
+    return str(quantity)
+
+
+class Valuation:
+    def __init__(self, quantity, valuation):
+        """
+        :param quantity: Quantity valued by this Valuation (a bundle, see make_bundle, if there are several items).
+        :param valuation: Number representing valuation for quantity.
+        """
+        self.quantity = quantity
+        self.valuation = valuation
+
+
+class Assignment:
+    def __init__(self, quantity, agent_id, valuation, count=1):
+        """
+        :param quantity: Quantity assigned to agent.
+        :param agent_id: Agent identifier this assignment concerns.
+        :param valuation: Valuation (number) agent has for quantity.
+        :param count: Number of members of an agent class receiving quantity (each valuing it at valuation).
+        """
+        self.quantity = quantity
+        self.agent_id = agent_id
+        self.valuation = valuation
+        self.count = count
+
+    def print_me(self, log):
+        """
+        Prints out assignment to console.
+        """
+        log.log('Agent %s receives %s item(s) (v_%s(%s)=%s)%s' % \
+              (self.agent_id, self.quantity, self.agent_id, self.quantity, self.valuation,
+               ' %s times' % self.count if self.count != 1 else ''))
+
+
+class Allocation:
+    def __init__(self, assignments=None, probability=None):
+        if not assignments:
+            assignments = []
+        self.assignments = assignments
+        self.probability = probability
+
+    @property
+    def key(self):
+        """
+        :return: Returns canonical key, allocations assigning the same bundles to the same agents share it (however \
+        the members of a class are counted).
+        """
+        counts = dict()
+        for assignment in self.assignments:
+            key = (assignment.agent_id, assignment.quantity)
+            counts[key] = counts.get(key, 0) + assignment.count
+        return tuple(sorted((agent_id, quantity, count) for (agent_id, quantity), count in counts.iteritems()))
+
+    @property
+    def quantity_assigned(self):
+        return sum([assignment.quantity * assignment.count for assignment in self.assignments])
+
+    @property
+    def quantities_assigned(self):
+        """
+        :return: Returns dict(item: quantity assigned), the single item is None.
+        """
+        quantities = dict()
+        for assignment in self.assignments:
+            for item, count in bundle_items(assignment.quantity):
+                quantities[item] = quantities.get(item, 0) + count * assignment.count
+        return quantities
+
+    def fits(self, supply):
+        """
+        :param supply: Supply of the single item or dict(item: supply).
+        :return: Returns True if the allocation does not assign more than supply of any item.
+        """
+        supplies = item_supply(supply)
+        return all(count <= supplies.get(item, 0) for item, count in self.quantities_assigned.iteritems())
+
+    @property
+    def expected_social_welfare(self):
+        if not self.probability:
+            return 0
+        return sum([assignment.valuation * assignment.count for assignment in self.assignments]) * self.probability
+
+    def get_expected_social_welfare_without_agent(self, agent_id_to_exclude):
+        if not self.probability:
+            return 0
+        return sum([assignment.valuation * assignment.count for assignment in self.assignments if assignment.agent_id!=agent_id_to_exclude]) * self.probability
+
+    def append(self, assignment):
+        self.assignments.append(assignment)
+
+
+    def print_me(self, log):
+        for assignment in self.assignments:
+            assignment.print_me(log)
+
+
+class BlackHoleLogger:
+    def __init__(self):
+        pass
+
+    def log(self, message):
+        pass
+
+
+class ConsoleLogger:
+    def __init__(self):
+        pass
+
+    def log(self, message):
+        print message
+
+epsilon = 1e-3
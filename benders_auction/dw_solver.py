@@ -0,0 +1,234 @@
+from benders_auction.backends import np
+from benders_auction.checkpoint import write_snapshot, read_snapshot, encode_allocations, decode_allocations, \
+    revalue_allocation
+from benders_auction.common import ConsoleLogger, Allocation, epsilon
+from benders_auction.population import as_agents
+from benders_auction.preprocessing import ValuationPreprocessor
+from benders_auction.solver import LaviSwamyGreedyApproximator
+
+__author__ = 'Usiel'
+
+
+class DwSolver:
+    def __init__(self, agents, supply, preprocess=True, approximator=LaviSwamyGreedyApproximator):
+        self.preprocessor = ValuationPreprocessor(agents, ConsoleLogger()) if preprocess else None
+        self.agents = self.preprocessor.agents if preprocess else as_agents(agents)
+        self.supply = supply
+
+        self.approximator = approximator(supply, self.agents, ConsoleLogger())
+
+        m_range = range(0, len(self.agents) + 2)
+        self.base = []
+        for i in m_range:
+            row = []
+            for j in m_range:
+                if i == j:
+                    row += [1.]
+                else:
+                    row += [0.]
+            self.base.append(row)
+        self.z = [0. for i in m_range] + [0.]
+        self.b = [1 / self.approximator.gap for i in range(0, len(self.agents))] + [supply / self.approximator.gap] + [1.]
+        self.row_names = ['s%s' % i for i, row in enumerate(self.base) if i < len(self.base)-1] + ['l0']
+        self.cost = 0.
+        self.allocations = dict()
+        self.allocations[0] = Allocation()
+        # columns of a warm start, tried before asking the approximator
+        self.pending_allocations = []
+        self.checkpoint_path = None
+        self.checkpoint_interval = None
+
+    @property
+    def utilities(self):
+        return self.z_to_utilities(self.z)
+
+    @property
+    def price(self):
+        return self.z_to_price(self.z)
+
+    def z_to_price(self, z):
+        return -z[len(self.agents)]
+
+    def z_to_utilities(self, z):
+        # rows are in agent order, utilities are keyed by agent id (ids need not be 0..n-1)
+        return dict(zip([agent.id for agent in self.agents], z[0:len(self.agents)]))
+
+    def iterate(self):
+        print ''
+        allocation = self.next_allocation()
+
+        new_base = self.base[:]
+        new_b = self.b[:]
+        new_z = self.z[:]
+
+        # A*X_j
+        constraints = [1. if any([assignment.agent_id == agent.id for assignment in allocation.assignments]) else 0.
+                       for agent in self.agents] + [allocation.quantity_assigned] + [1.]
+
+        # entering column
+        y_k = []
+        for row in new_base:
+            y_k += [sum([base_value * constraint_value for base_value, constraint_value in zip(row, constraints)])]
+
+        self.print_tableau(y_k)
+
+        # leaving variable row index
+        # print 'Recommendation is row %s' % self.get_leaving_row_index(new_b, y_k)
+        #r = None
+        #while r == None:
+        #     input = int(raw_input('row index please: '))
+        #     if True or y_k[input] > 0:
+        #        r = input
+
+        r = self.get_leaving_row_index(new_b, y_k, new_base)
+
+        # divide selected row by y_kr
+        new_base = [base_row if index != r else [
+            base_value / y_k[r] for base_value in base_row] for index, base_row in
+                    enumerate(new_base)]
+        new_b = [b_value if index != r else b_value / y_k[r] for index, b_value in enumerate(new_b)]
+
+        # add -y_kr * pivot_row to each row (except pivot row)
+        new_base = [base_row if index == r else
+                    [base_cell + (new_cell * -y_k[index]) for base_cell, new_cell in
+                     zip(base_row, new_base[r])] for index, base_row in
+                    enumerate(new_base)]
+        new_b = [b_value if index == r else b_value + (new_b[r] * -y_k[index]) for
+                 index, b_value in enumerate(new_b)]
+
+        # add (z-c) * new_row + row_z
+        social_welfare = self.reduced_cost(allocation)
+        #social_welfare = 1 if new_z[len(new_z)-2] == 0. else 0
+
+        new_z = [z_value - (social_welfare * pivot_row_value) for z_value, pivot_row_value in zip(new_z, new_base[r] + [new_b[r]])]
+
+        print 'z - c = %s' % social_welfare
+
+        self.allocations[len(self.allocations)] = allocation
+        self.row_names[r] = 'l%s' % (len(self.allocations)-1)
+        self.base = new_base
+        self.b = new_b
+        self.z = new_z
+
+        self.print_tableau()
+
+        if self.checkpoint_path and (len(self.allocations) - 1) % self.checkpoint_interval == 0:
+            self.checkpoint(self.checkpoint_path)
+
+        if social_welfare > 0:
+            return True
+        else:
+            return False
+
+    def next_allocation(self):
+        """
+        :return: Returns the next pending allocation of a warm start which improves the current basis, otherwise \
+        the allocation of the approximator.
+        """
+        while self.pending_allocations:
+            allocation = self.pending_allocations.pop(0)
+            if self.reduced_cost(allocation) > epsilon:
+                return allocation
+        allocation = self.approximator.approximate(self.price, {k: -u for k,u in self.utilities.iteritems()})
+        if self.preprocessor:
+            allocation = self.preprocessor.translate(allocation)
+        return allocation
+
+    def reduced_cost(self, allocation):
+        # z - c = sum(valuations) - quantity * price - utility * x_ij
+        return sum([assignment.valuation for assignment in allocation.assignments]) \
+            - allocation.quantity_assigned * self.price \
+            + sum([self.utilities[agent.id]
+                   if any([assignment.agent_id == agent.id for assignment in allocation.assignments])
+                   else 0
+                   for agent in self.agents])
+
+    def enable_checkpoints(self, path, interval=10):
+        """
+        Writes a snapshot (see checkpoint) every interval iterations.
+        :param path: File to write.
+        :param interval: Number of iterations between snapshots.
+        """
+        self.checkpoint_path = path
+        self.checkpoint_interval = interval
+
+    def checkpoint(self, path):
+        """
+        Writes basis inverse, b, z, row names and all allocations (columns) to path.
+        :param path: File to write.
+        """
+        arrays = encode_allocations(self.allocations)
+        arrays['base'] = np.array(self.base, dtype=np.float64)
+        arrays['b'] = np.array(self.b, dtype=np.float64)
+        arrays['z'] = np.array(self.z, dtype=np.float64)
+        meta = {'supply': self.supply,
+                'agent_ids': [agent.id for agent in self.agents],
+                'row_names': self.row_names,
+                'cost': self.cost}
+        write_snapshot(path, 'dw', meta, arrays)
+
+    def resume(self, path, warm_start=False):
+        """
+        Without warm_start the tableau of a snapshot of this instance is restored and iterating continues where the \
+        snapshot was taken. With warm_start the instance may differ, the tableau starts from scratch but the \
+        (revalued, see revalue_allocation) allocations of the snapshot enter before the approximator is asked.
+        :param path: File written by checkpoint.
+        :param warm_start: If True the snapshot is only used for pending columns.
+        """
+        meta, arrays = read_snapshot(path, 'dw')
+        allocations = decode_allocations(arrays)
+        if warm_start:
+            agents_by_id = dict((agent.id, agent) for agent in self.agents)
+            self.pending_allocations = [allocation for allocation in
+                                        [revalue_allocation(allocation, agents_by_id, self.supply)
+                                         for allocation in allocations.itervalues()] if allocation]
+            print 'Warm start with %s of %s columns from %s' % (len(self.pending_allocations), len(allocations), path)
+            return
+
+        if meta['agent_ids'] != [agent.id for agent in self.agents] or meta['supply'] != self.supply:
+            raise ValueError('%s belongs to another instance (use warm_start)' % path)
+        self.base = arrays['base'].tolist()
+        self.b = arrays['b'].tolist()
+        self.z = arrays['z'].tolist()
+        self.row_names = meta['row_names']
+        self.cost = meta['cost']
+        self.allocations = dict((int(name), allocation) for name, allocation in allocations.iteritems())
+
+    def set_allocation_probabilities(self):
+        """
+        Basic columns l_k are the convex combination weights of allocation k, all other allocations get 0.
+        """
+        for allocation in self.allocations.itervalues():
+            allocation.probability = 0.
+        for row_name, b_value in zip(self.row_names, self.b):
+            if row_name.startswith('l'):
+                self.allocations[int(row_name[1:])].probability = b_value
+
+    def get_leaving_row_index(self, b, y_k, base):
+        # return int(raw_input('leaving var row index: '))
+        ratios = {index: b_value/y_value for index, (b_value, y_value) in enumerate(zip(b, y_k)) if y_value > 0}
+        row_index = min(ratios.iteritems(), key=lambda r: r[1])[0]
+        print ''
+        print 'Pivoting at row %s' % row_index
+        print ''
+        return row_index
+
+    def print_tableau(self, y_k = None):
+        print 'z \t | \t',
+        for i, z in enumerate(self.z):
+            if i == len(self.z)-2:
+                print '%s \t | \t' % z,
+            else:
+                print '%s \t' % z,
+        print ''
+        print '-----------------------------------------------------------'
+
+        for index, row in enumerate(self.base):
+            print '%s \t | \t' % self.row_names[index],
+            for b in row:
+                print '%s \t' % b,
+            print '| \t %s' % self.b[index],
+            if y_k:
+                print '\t | \t %s' % y_k[index]
+            else:
+                print ''
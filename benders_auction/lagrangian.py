@@ -0,0 +1,140 @@
+from collections import OrderedDict
+
+from benders_auction.population import as_agents, exposes_valuations, agent_bids
+
+__author__ = 'Usiel'
+
+
+def demand_hull(valuations, supply):
+    """
+    Upper concave hull of the points (j, v(j)) and (0, 0), cut off where it stops increasing. Demand at price p is \
+    the last hull vertex reached with a slope above p, so the slopes are the prices at which demand changes.
+    :param valuations: List of Valuation.
+    :param supply: Bundles larger than supply are ignored.
+    :return: Returns (quantities, values, slopes), slopes[k] leads from vertex k to vertex k+1 (decreasing).
+    """
+    return bids_hull([valuation.quantity for valuation in valuations],
+                     [valuation.valuation for valuation in valuations], supply)
+
+
+def bids_hull(quantities, values, supply):
+    """
+    Same as demand_hull for bids given as lists (see agent_bids).
+    """
+    hull = [(0, 0.)]
+    for quantity, value in sorted((quantity, float(value)) for quantity, value in zip(quantities, values)
+                                  if 0 < quantity <= supply):
+        # pop vertices on or below the line from their predecessor to the new point
+        while len(hull) >= 2 and (hull[-1][0] - hull[-2][0]) * (value - hull[-2][1]) - \
+                (hull[-1][1] - hull[-2][1]) * (quantity - hull[-2][0]) >= 0:
+            hull.pop()
+        if quantity == hull[-1][0]:
+            if value <= hull[-1][1]:
+                continue
+            hull.pop()
+        hull.append((quantity, value))
+
+    quantities, values, slopes = [0], [0.], []
+    for quantity, value in hull[1:]:
+        slope = (value - values[-1]) / (quantity - quantities[-1])
+        if slope <= 0:
+            break
+        quantities.append(quantity)
+        values.append(value)
+        slopes.append(slope)
+    return quantities, values, slopes
+
+
+class LagrangianSolver:
+    def __init__(self, supply, agents):
+        """
+        Solves the LP of OptimalSolver exactly through its one-dimensional dual \
+        min_p>=0 sum_i max(0, max_j v_i(j) - p*j) + p*supply, which is convex and piecewise linear. Aggregated \
+        demand only changes at the slopes of the agents' demand hulls, so sorting all N slopes and sweeping them once \
+        finds the optimal price in O(N log N) without any LP library.
+        :param supply: Supply up for auction.
+        :param agents: List of agents, AgentClass or AgentPopulation (need valuations).
+        """
+        self.supply = supply
+        self.agents = as_agents(agents)
+        self.hulls = OrderedDict()
+        for agent in self.agents:
+            if not exposes_valuations(agent):
+                raise ValueError('agent %s does not expose valuations' % agent.id)
+            self.hulls[agent.id] = bids_hull(*agent_bids(agent, supply), supply=supply)
+        self.multiplicities = dict((agent.id, getattr(agent, 'multiplicity', 1)) for agent in self.agents)
+
+        self.price = 0.
+        # demand just below and just above the price, the indifferent agents split their demand by share_before
+        self.demand_before = self.demand_after = sum(quantities[-1] * self.multiplicities[agent_id]
+                                                     for agent_id, (quantities, values, slopes)
+                                                     in self.hulls.iteritems())
+        self.share_before = 1.
+        self.sweep()
+
+        self.utilities = OrderedDict()
+        # allocation maps (agent_id, quantity) to x, the (fractional) number of members receiving quantity
+        self.allocation = dict()
+        for agent_id, (quantities, values, slopes) in self.hulls.iteritems():
+            multiplicity = self.multiplicities[agent_id]
+            # slopes are decreasing, the agent demands vertex k where k is the number of slopes above the price
+            k = 0
+            while k < len(slopes) and slopes[k] > self.price:
+                k += 1
+            self.utilities[agent_id] = values[k] - self.price * quantities[k]
+            if k < len(slopes) and slopes[k] == self.price:
+                self.add_to_allocation(agent_id, quantities[k + 1], self.share_before * multiplicity)
+                self.add_to_allocation(agent_id, quantities[k], (1. - self.share_before) * multiplicity)
+            else:
+                self.add_to_allocation(agent_id, quantities[k], multiplicity)
+
+        self.objective = sum(utility * self.multiplicities[agent_id] for agent_id, utility
+                             in self.utilities.iteritems()) + self.price * self.supply
+
+    def sweep(self):
+        if self.demand_before <= self.supply:
+            return
+        events = sorted((slope, (quantities[k + 1] - quantities[k]) * self.multiplicities[agent_id])
+                        for agent_id, (quantities, values, slopes) in self.hulls.iteritems()
+                        for k, slope in enumerate(slopes))
+        demand = self.demand_before
+        i = 0
+        while i < len(events):
+            price = events[i][0]
+            before = demand
+            while i < len(events) and events[i][0] == price:
+                demand -= events[i][1]
+                i += 1
+            if demand <= self.supply:
+                self.price = price
+                self.demand_before = before
+                self.demand_after = demand
+                self.share_before = float(self.supply - demand) / (before - demand)
+                return
+
+    def add_to_allocation(self, agent_id, quantity, x):
+        if quantity > 0 and x > 0:
+            self.allocation[agent_id, quantity] = self.allocation.get((agent_id, quantity), 0.) + x
+
+    @property
+    def primal_objective(self):
+        """
+        :return: Returns social welfare of the fractional allocation (equals objective).
+        """
+        values = dict((agent.id, dict(zip(*agent_bids(agent)))) for agent in self.agents)
+        return sum(values[agent_id][quantity] * x for (agent_id, quantity), x in self.allocation.iteritems())
+
+    def dual_objective(self, price):
+        """
+        :param price: Any price >= 0.
+        :return: Returns value of the dual at price (an upper bound on the LP optimum).
+        """
+        total = price * self.supply
+        for agent_id, (quantities, values, slopes) in self.hulls.iteritems():
+            total += self.multiplicities[agent_id] * max(value - price * quantity
+                                                         for quantity, value in zip(quantities, values))
+        return total
+
+    def print_results(self, log):
+        log.log('LP optimum %s at price %s (demand %s/%s around the price, supply %s)' % (
+            self.objective, self.price, self.demand_before, self.demand_after, self.supply))
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+from benders_auction.backends import gp
+
+__author__ = 'Usiel'
+
+# ModelPool of every process, see model_pool()
+pools = dict()
+
+
+class ModelPool:
+    def __init__(self, size=8):
+        """
+        ModelPool keeps released gurobi models of one process for reuse. A reused model loses its constraints, its \
+        variables are kept if the next user asks for as many (only bounds, names and objective coefficients are \
+        reset), otherwise they are replaced. Models live in the environment of the process that created them, so \
+        processes must not share a pool (see model_pool()).
+        :param size: Maximal number of idle models kept.
+        """
+        self.pid = os.getpid()
+        self.size = size
+        self.env = None
+        self.idle = []
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.variables_reused = 0
+        # time spent creating models (misses) and resetting models (hits)
+        self.creation_time = 0.
+        self.reset_time = 0.
+
+    def acquire(self, name, variables=()):
+        """
+        :param name: Name of the model.
+        :param variables: List of (lb, ub, name) of the continuous variables the model needs.
+        :return: Returns (model without constraints, list of variables), the model has to be released after use.
+        """
+        start = time.time()
+        with self.lock:
+            # a model with as many variables as needed keeps them
+            candidates = [model for model in self.idle if model.NumVars == len(variables)] or self.idle[-1:]
+            model = candidates[0] if candidates else None
+            if model:
+                self.idle.remove(model)
+        if model is None:
+            if self.env is None:
+                self.env = gp.Env()
+            model = gp.Model(name, env=self.env)
+            model_variables = [model.addVar(lb=lb, ub=ub, name=variable_name) for lb, ub, variable_name in variables]
+            model.update()
+            self.misses += 1
+            self.creation_time += time.time() - start
+            return model, model_variables
+
+        model.remove(model.getConstrs())
+        model_variables = model.getVars()
+        if len(model_variables) == len(variables):
+            self.variables_reused += 1
+        else:
+            model.remove(model_variables)
+            model_variables = []
+        model.update()
+        if model_variables:
+            model.setAttr('LB', model_variables, [lb for lb, ub, variable_name in variables])
+            model.setAttr('UB', model_variables, [ub for lb, ub, variable_name in variables])
+            model.setAttr('VarName', model_variables, [variable_name for lb, ub, variable_name in variables])
+            model.setAttr('Obj', model_variables, [0.] * len(model_variables))
+        else:
+            model_variables = [model.addVar(lb=lb, ub=ub, name=variable_name) for lb, ub, variable_name in variables]
+        model.ModelName = name
+        model.resetParams()
+        model.reset()
+        model.update()
+        self.hits += 1
+        self.reset_time += time.time() - start
+        return model, model_variables
+
+    def release(self, model):
+        """
+        Returns a model to the pool, its user must not touch it (or its variables) afterwards.
+        :param model: Model returned by acquire.
+        """
+        if model is None or os.getpid() != self.pid:
+            return
+        with self.lock:
+            if len(self.idle) < self.size and model not in self.idle:
+                self.idle.append(model)
+
+    @property
+    def time_saved(self):
+        """
+        :return: Returns estimated seconds saved by reusing models instead of creating them.
+        """
+        if not self.misses:
+            return 0.
+        return max(0., self.hits * self.creation_time / self.misses - self.reset_time)
+
+    def print_report(self, log):
+        log.log('Model pool: %s hits (%s with variables kept), %s misses, %.1fms saved' %
+                (self.hits, self.variables_reused, self.misses, self.time_saved * 1000))
+
+
+def model_pool():
+    """
+    :return: Returns the ModelPool of the calling process (forked workers get a pool of their own).
+    """
+    pid = os.getpid()
+    if pid not in pools:
+        pools[pid] = ModelPool()
+    return pools[pid]
@@ -0,0 +1,334 @@
+import struct
+
+from benders_auction.backends import np
+
+from benders_auction.agent import ManualAgent, QueryCache, next_agent_id
+from benders_auction.common import Valuation, epsilon
+
+__author__ = 'Usiel'
+
+# file layout: HEADER (padded to HEADER_SIZE), then
+#   dense:       values float64[agents x supply] (-inf if not bid on), ids int64[agents]
+#   breakpoints: records (quantity int64, value float64)[entries], offsets int64[agents + 1], ids int64[agents]
+MAGIC = 'BIDBOOK\0'
+VERSION = 1
+BREAKPOINTS = 1
+HEADER = struct.Struct('<8sHHqqq')
+HEADER_SIZE = 64
+RECORD = [('quantity', '<i8'), ('value', '<f8')]
+RECORD_SIZE = 16
+
+
+class PopulationAgent(ManualAgent):
+    def __init__(self, identifier, quantities, values, free_disposal=False):
+        """
+        PopulationAgent is a view on one row of a population, queries are answered on the arrays directly. \
+        Valuation objects are only built (once) if someone asks for all valuations, solvers read the arrays through \
+        agent_bids instead. The query cache is only created on the first query.
+        :param identifier: Identifier (unique).
+        :param quantities: Array of quantities bid on.
+        :param values: Array of values (same length as quantities, -inf if not bid on).
+        :param free_disposal: If True quantities are breakpoints, value queries get the best breakpoint not larger.
+        """
+        self.id = identifier
+        self.quantities = quantities
+        self.values = values
+        self.free_disposal = free_disposal
+        self.query_cache = None
+        self.valuation_list = None
+
+    @property
+    def cache(self):
+        if self.query_cache is None:
+            self.query_cache = QueryCache()
+        return self.query_cache
+
+    @property
+    def valuations(self):
+        if self.valuation_list is None:
+            self.valuation_list = [Valuation(quantity, value) for quantity, value in
+                                   zip(self.quantities.tolist(), self.values.tolist()) if value > -np.inf]
+        return self.valuation_list
+
+    def bids(self, left_supply):
+        valid = (self.quantities <= left_supply) & (self.values > -np.inf)
+        return self.quantities[valid], self.values[valid]
+
+    def calculate_demand(self, price, left_supply):
+        quantities, values = self.bids(left_supply)
+        if not len(quantities):
+            return None
+        utilities = values - quantities * price
+        # as ManualAgent: the last valuation of maximal utility
+        best = len(utilities) - 1 - np.argmax(utilities[::-1])
+        if utilities[best] < -epsilon:
+            return None
+        return Valuation(int(quantities[best]), float(values[best]))
+
+    def calculate_relative_demand(self, price, left_supply):
+        quantities, values = self.bids(left_supply)
+        utilities = (values - quantities * price) / quantities
+        if not len(utilities) or utilities.max() <= 0:
+            return None
+        best = len(utilities) - 1 - np.argmax(utilities[::-1])
+        return Valuation(int(quantities[best]), float(values[best]))
+
+    def calculate_demand_set(self, price, left_supply):
+        quantities, values = self.bids(left_supply)
+        if not len(quantities):
+            return set()
+        utilities = values - quantities * price
+        in_set = (utilities + epsilon >= utilities.max()) & (utilities + epsilon >= 0)
+        return {Valuation(int(quantity), float(value)) for quantity, value in zip(quantities[in_set],
+                                                                                    values[in_set])}
+
+    def calculate_value(self, quantity):
+        if self.free_disposal:
+            quantities, values = self.bids(quantity)
+            if not len(quantities):
+                return Valuation(0, 0.)
+            return Valuation(int(quantities[-1]), float(values[-1]))
+        found = np.flatnonzero((self.quantities == quantity) & (self.values > -np.inf))
+        if not len(found):
+            return None
+        return Valuation(quantity, float(self.values[found[0]]))
+
+    def calculate_marginal_value(self, additional_quantity, quantity_owned):
+        owned = self.calculate_value(quantity_owned) if quantity_owned > 0 else Valuation(0, 0.)
+        combined = self.calculate_value(quantity_owned + additional_quantity)
+        return (combined.valuation if combined else 0.) - owned.valuation
+
+
+class AgentPopulation:
+    def __init__(self, ids, values):
+        """
+        AgentPopulation holds the valuations of many agents in one matrix. Agents are only built when asked for, \
+        so large populations can be generated, stored and handed to a ShardedAgentPool without Python objects.
+        :param ids: Sequence of agent ids.
+        :param values: Matrix (agents x supply) with values[i, j-1] = v_i(j), -inf for bundles not bid on.
+        """
+        self.ids = np.asarray(ids)
+        self.values = values
+        self.quantities = np.arange(1, self.values.shape[1] + 1)
+
+    @property
+    def supply(self):
+        return self.values.shape[1]
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def __getitem__(self, index):
+        """
+        :param index: Position of agent in population.
+        :return: Returns PopulationAgent viewing row index.
+        """
+        return PopulationAgent(int(self.ids[index]), self.quantities, self.values[index])
+
+    def __iter__(self):
+        for index in range(0, len(self)):
+            yield self[index]
+
+    def agents(self):
+        return list(self)
+
+    def dense_values(self):
+        return self.values
+
+    def rows(self, chunk_size=1024):
+        """
+        :param chunk_size: Rows read at once.
+        :return: Returns generator of (id, quantities, values) for all agents.
+        """
+        for start in range(0, len(self), chunk_size):
+            values = np.asarray(self.values[start:start + chunk_size])
+            for index, row in enumerate(values):
+                yield int(self.ids[start + index]), self.quantities, row
+
+    def to_pool(self, workers=None):
+        """
+        :param workers: Number of worker processes.
+        :return: Returns ShardedAgentPool holding the population.
+        """
+        from benders_auction.sharding import ShardedAgentPool
+        return ShardedAgentPool(self.ids, self.dense_values(), workers)
+
+
+class BreakpointPopulation(AgentPopulation):
+    def __init__(self, ids, records, offsets, supply):
+        """
+        BreakpointPopulation only holds the bundles at which an agent's value increases (as CompressedAgent does), \
+        the bundles of agent i are records[offsets[i]:offsets[i+1]].
+        :param ids: Sequence of agent ids.
+        :param records: Array of (quantity, value) ordered by quantity per agent.
+        :param offsets: Array of agents + 1 offsets into records.
+        :param supply: Supply the population was written for.
+        """
+        self.ids = np.asarray(ids)
+        self.records = records
+        self.offsets = offsets
+        self.breakpoint_supply = supply
+
+    @property
+    def supply(self):
+        return self.breakpoint_supply
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        records = self.records[self.offsets[index]:self.offsets[index + 1]]
+        return PopulationAgent(int(self.ids[index]), records['quantity'], records['value'], True)
+
+    def dense_values(self):
+        values = np.full((len(self), self.supply), -np.inf)
+        for index in range(0, len(self)):
+            records = self.records[self.offsets[index]:self.offsets[index + 1]]
+            values[index, records['quantity'] - 1] = records['value']
+        return values
+
+    def rows(self, chunk_size=1024):
+        for index in range(0, len(self)):
+            agent = self[index]
+            yield agent.id, agent.quantities, agent.values
+
+
+def as_agents(agents):
+    """
+    :param agents: List of agents or AgentPopulation.
+    :return: Returns list of agents.
+    """
+    if isinstance(agents, AgentPopulation):
+        return agents.agents()
+    return agents
+
+
+def exposes_valuations(agent):
+    """
+    :param agent: Agent or AgentClass.
+    :return: Returns True if agent_bids can be asked (without building valuations of a PopulationAgent).
+    """
+    agent = agent.representative if hasattr(agent, 'members') else agent
+    return isinstance(agent, PopulationAgent) or hasattr(agent, 'valuations')
+
+
+def agent_bids(agent, supply=None):
+    """
+    :param agent: Agent or AgentClass exposing valuations (see exposes_valuations).
+    :param supply: Optional, larger bundles are left out (single item only).
+    :return: Returns (quantities, values) as lists ordered by quantity. A PopulationAgent's arrays are read \
+    directly, no Valuation objects are built.
+    """
+    agent = agent.representative if hasattr(agent, 'members') else agent
+    if isinstance(agent, PopulationAgent):
+        quantities, values = agent.bids(np.inf if supply is None else supply)
+        return quantities.tolist(), values.tolist()
+    bids = sorted((valuation.quantity, valuation.valuation) for valuation in agent.valuations
+                  if supply is None or valuation.quantity <= supply)
+    return [quantity for quantity, value in bids], [value for quantity, value in bids]
+
+
+def agent_rows(agents):
+    """
+    :param agents: AgentPopulation or iterable of agents (need valuations).
+    :return: Returns generator of (id, quantities, values).
+    """
+    if isinstance(agents, AgentPopulation):
+        return agents.rows()
+    return ((agent.id, np.array(quantities, dtype=np.int64), np.array(values, dtype=np.float64))
+            for agent, (quantities, values) in ((agent, agent_bids(agent)) for agent in agents))
+
+
+def write_population(path, agents, supply=None, breakpoints=False):
+    """
+    Streams agents to a file, only one agent is held in memory at a time (plus the ids).
+    :param path: File to write.
+    :param agents: AgentPopulation or iterable of agents (need valuations).
+    :param supply: Supply up for auction (defaults to the supply of a population).
+    :param breakpoints: If True only bundles at which the value increases are written.
+    :return: Returns number of agents written.
+    """
+    if supply is None:
+        supply = agents.supply
+    ids = []
+    offsets = [0]
+    with open(path, 'wb') as output:
+        output.write('\0' * HEADER_SIZE)
+        for identifier, quantities, values in agent_rows(agents):
+            ids.append(identifier)
+            valid = (quantities >= 1) & (quantities <= supply) & (values > -np.inf)
+            quantities, values = quantities[valid], values[valid]
+            if breakpoints:
+                order = np.argsort(quantities, kind='mergesort')
+                quantities, values = quantities[order], values[order]
+                # a bundle is a breakpoint if it is worth more than every smaller bundle (and the empty bundle)
+                best_smaller = np.maximum.accumulate(np.concatenate(([0.], values)))[:-1]
+                kept = values > best_smaller
+                records = np.empty(kept.sum(), dtype=RECORD)
+                records['quantity'] = quantities[kept]
+                records['value'] = values[kept]
+                output.write(records.tobytes())
+                offsets.append(offsets[-1] + len(records))
+            else:
+                row = np.full(supply, -np.inf)
+                row[quantities - 1] = values
+                output.write(row.tobytes())
+        if breakpoints:
+            output.write(np.array(offsets, dtype=np.int64).tobytes())
+        output.write(np.array(ids, dtype=np.int64).tobytes())
+
+        entries = offsets[-1] if breakpoints else len(ids) * supply
+        output.seek(0)
+        output.write(HEADER.pack(MAGIC, VERSION, BREAKPOINTS if breakpoints else 0, len(ids), supply, entries))
+    return len(ids)
+
+
+def load_population(path):
+    """
+    Memory-maps a file written by write_population, no valuations are read until they are used.
+    :param path: File to load.
+    :return: Returns AgentPopulation (or BreakpointPopulation) backed by the file.
+    """
+    with open(path, 'rb') as source:
+        magic, version, flags, agents_count, supply, entries = HEADER.unpack(source.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError('%s is not a population file' % path)
+    if version != VERSION:
+        raise ValueError('%s has unsupported version %s' % (path, version))
+
+    if flags & BREAKPOINTS:
+        records = np.memmap(path, RECORD, 'r', HEADER_SIZE, (entries,)) if entries else np.empty(0, RECORD)
+        offset = HEADER_SIZE + entries * RECORD_SIZE
+        offsets = np.memmap(path, np.int64, 'r', offset, (agents_count + 1,))
+        ids = np.memmap(path, np.int64, 'r', offset + (agents_count + 1) * 8, (agents_count,)) \
+            if agents_count else np.empty(0, np.int64)
+        return BreakpointPopulation(ids, records, offsets, supply)
+
+    if not agents_count:
+        return AgentPopulation(np.empty(0, np.int64), np.empty((0, supply)))
+    values = np.memmap(path, np.float64, 'r', HEADER_SIZE, (agents_count, supply))
+    ids = np.memmap(path, np.int64, 'r', HEADER_SIZE + entries * 8, (agents_count,))
+    return AgentPopulation(ids, values)
+
+
+def generate_randomized_population(supply, agents_count, seed=None, rng=None, scale=5.0):
+    """
+    Generates agents as RandomizedAgent does (v_i(j) = v_i(j-1) + floor(Exp(scale))), but draws all increments \
+    in one go.
+    :param supply: Supply up for auction.
+    :param agents_count: Agents to generate.
+    :param seed: Seed for a new numpy.random.RandomState (ignored if rng given).
+    :param rng: Optional random generator providing exponential(scale, size).
+    :param scale: Scale of the exponentially distributed increments.
+    :return: Returns AgentPopulation.
+    """
+    if rng is None:
+        rng = np.random.RandomState(seed)
+    values = rng.exponential(scale, (agents_count, supply))
+    # valuations are whole numbers, so flooring each increment equals flooring the running sum
+    np.floor(values, out=values)
+    np.cumsum(values, axis=1, out=values)
+
+    first_id = next_agent_id.counter + 1
+    next_agent_id.counter += agents_count
+    return AgentPopulation(np.arange(first_id, first_id + agents_count), values)
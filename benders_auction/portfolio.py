@@ -0,0 +1,213 @@
+import argparse
+import errno
+import fcntl
+import json
+import math
+import multiprocessing
+import os
+import Queue
+import sys
+import time
+
+from benders_auction.batch import parse_agents, solve_instance
+from benders_auction.lagrangian import demand_hull
+
+__author__ = 'Usiel'
+
+# configurations raced by default, each overrides mechanism and approximator of an instance
+CONFIGURATIONS = [('benders/lavi-swamy', {'mechanism': 'benders', 'vcg': False, 'approximator': 'lavi-swamy'}),
+                  ('benders/nisan', {'mechanism': 'benders', 'vcg': False, 'approximator': 'nisan'}),
+                  ('dw/lavi-swamy', {'mechanism': 'dw', 'approximator': 'lavi-swamy'}),
+                  ('dw/nisan', {'mechanism': 'dw', 'approximator': 'nisan'})]
+
+
+def instance_features(instance):
+    """
+    Describes the shape of an instance coarsely, instances of similar shape share a winner.
+    :param instance: Decoded instance (see batch.solve_instance).
+    :return: Returns feature vector as list: log2 of agents, log2 of supply, log2 of supply per agent and share of \
+    agents with concave valuations (in tenths). For several item types supply is the sum over the items, concavity \
+    is not defined (0) and the number of items is appended.
+    """
+    agents = parse_agents(instance)
+    supply = instance['supply']
+    if isinstance(supply, dict):
+        total = sum(supply.itervalues())
+        concave = 0
+    else:
+        total = supply
+        # valuations are concave if every bundle bid on lies on the agent's demand hull
+        concave = sum(len(demand_hull(agent.valuations, supply)[0]) - 1 ==
+                      len([valuation for valuation in agent.valuations if 0 < valuation.quantity <= supply])
+                      for agent in agents)
+    features = [int(math.log(max(len(agents), 1), 2)),
+                int(math.log(max(total, 1), 2)),
+                int(math.floor(math.log(float(max(total, 1)) / max(len(agents), 1), 2))),
+                int(10. * concave / max(len(agents), 1))]
+    if isinstance(supply, dict):
+        features.append(len(supply))
+    return features
+
+
+class PortfolioHistory:
+    def __init__(self, path):
+        """
+        PortfolioHistory counts the wins of every configuration per feature vector in a JSON file. Updates are \
+        guarded by a file lock and written atomically, so several processes may share a history.
+        :param path: JSON file (created on first record).
+        """
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as source:
+                return json.load(source)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return dict()
+
+    def record(self, features, name):
+        """
+        :param features: Feature vector (see instance_features).
+        :param name: Name of the winning configuration.
+        """
+        with open(self.path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            history = self.load()
+            wins = history.setdefault(json.dumps(features), dict())
+            wins[name] = wins.get(name, 0) + 1
+            temporary = '%s.%s.tmp' % (self.path, os.getpid())
+            with open(temporary, 'w') as output:
+                json.dump(history, output, indent=1, sort_keys=True)
+            os.rename(temporary, self.path)
+
+    def likely_winner(self, features, trust=3, share=.75):
+        """
+        :param features: Feature vector (see instance_features).
+        :param trust: Minimal number of recorded races.
+        :param share: Minimal share of these races won.
+        :return: Returns name of the configuration winning instances of this shape or None if there is none yet.
+        """
+        wins = self.load().get(json.dumps(features), dict())
+        total = sum(wins.itervalues())
+        if total < trust:
+            return None
+        name, count = max(wins.iteritems(), key=lambda item: item[1])
+        return name if count >= share * total else None
+
+
+def run_configuration(instance, name, configuration, results):
+    """
+    Solves instance with one configuration in a process of its own.
+    :param results: multiprocessing.Queue receiving (name, result dict, elapsed seconds).
+    """
+    # solvers report on stdout, results only travel back through the queue
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    start = time.time()
+    try:
+        result = solve_instance(dict(instance, **configuration))
+        result['status'] = 'ok'
+    except Exception as e:
+        result = {'status': 'error', 'error': '%s: %s' % (type(e).__name__, e)}
+    results.put((name, result, time.time() - start))
+
+
+def race(instance, configurations=CONFIGURATIONS, history=None, target_gap=None, timeout=None):
+    """
+    Solves instance with several configurations at once. The first result which converged (or reports a gap within \
+    target_gap) wins and all other processes are terminated. Only if none does (e.g. Benders stopped by a cycle) \
+    the result of highest welfare wins once all configurations finished or the timeout passed. If history knows a \
+    likely winner for instances of this shape, only it is started.
+    :param instance: Decoded instance (see batch.solve_instance).
+    :param configurations: List of (name, dict overriding instance fields).
+    :param history: Optional PortfolioHistory, winners are recorded there.
+    :param target_gap: Optional relative gap at which Benders stops early (default from instance, else none).
+    :param timeout: Optional time in seconds after which the best result so far is returned.
+    :return: Returns result dict of the winner with configuration, raced configurations, elapsed (wall time until \
+    the decision) and solve_time (time the winner took).
+    """
+    target_gap = instance.get('target_gap') if target_gap is None else target_gap
+    features = instance_features(instance)
+    winner = history.likely_winner(features) if history else None
+    started = [item for item in configurations if item[0] == winner] or configurations
+
+    start = time.time()
+    results = multiprocessing.Queue()
+    processes = dict()
+    for name, configuration in started:
+        if configuration.get('mechanism') == 'benders' and target_gap is not None:
+            configuration = dict(configuration, target_gap=target_gap)
+        processes[name] = multiprocessing.Process(target=run_configuration,
+                                                  args=(instance, name, configuration, results))
+        processes[name].start()
+
+    best = None
+    received = 0
+    try:
+        while received < len(processes):
+            if timeout is not None and time.time() - start > timeout:
+                break
+            try:
+                name, result, elapsed = results.get(timeout=.1)
+            except Queue.Empty:
+                # a process killed from outside never reports
+                if not any(process.is_alive() for process in processes.itervalues()) and results.empty():
+                    break
+                continue
+            received += 1
+            if result['status'] != 'ok':
+                best = best or (name, result, elapsed)
+                continue
+            # every configuration reports welfare, only Benders reports a gap
+            if best is None or best[1]['status'] != 'ok' or result['welfare'] > best[1]['welfare']:
+                best = (name, result, elapsed)
+            if result.get('converged') or \
+                    (target_gap is not None and result.get('gap', float('inf')) <= target_gap + 1e-9):
+                best = (name, result, elapsed)
+                break
+    finally:
+        for process in processes.itervalues():
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+    if best is None:
+        return {'status': 'error', 'error': 'no configuration finished within %ss' % timeout,
+                'raced': sorted(processes)}
+    name, result, solve_time = best
+    if result['status'] != 'ok' and len(started) < len(configurations):
+        # the likely winner failed, the others still get their chance
+        return race(instance, [item for item in configurations if item[0] != winner], history, target_gap, timeout)
+    if history and result['status'] == 'ok' and len(processes) > 1:
+        history.record(features, name)
+    result.update(configuration=name, raced=sorted(processes), features=features, elapsed=time.time() - start,
+                  solve_time=solve_time)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Races solver configurations on auction instances given as '
+                                                 'JSON lines.')
+    parser.add_argument('input', nargs='?', default='-', help='JSONL file with instances (default stdin)')
+    parser.add_argument('-o', '--output', default='-', help='JSONL file for results (default stdout)')
+    parser.add_argument('--history', default=None, help='JSON file recording the winners per instance shape')
+    parser.add_argument('--target-gap', type=float, default=None, help='relative gap a result has to reach')
+    parser.add_argument('--timeout', type=float, default=None, help='seconds per instance')
+    arguments = parser.parse_args()
+
+    history = PortfolioHistory(arguments.history) if arguments.history else None
+    source = sys.stdin if arguments.input == '-' else open(arguments.input)
+    target = sys.stdout if arguments.output == '-' else open(arguments.output, 'w')
+    for sequence, line in enumerate(source):
+        if not line.strip():
+            continue
+        instance = json.loads(line)
+        result = race(instance, history=history, target_gap=arguments.target_gap, timeout=arguments.timeout)
+        result['id'] = instance.get('id', sequence)
+        target.write(json.dumps(result) + '\n')
+        target.flush()
+
+
+if __name__ == '__main__':
+    main()
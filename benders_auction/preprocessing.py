@@ -0,0 +1,186 @@
+from benders_auction.agent import ManualAgent
+from benders_auction.common import Valuation, Assignment, Allocation, BlackHoleLogger, epsilon
+from benders_auction.lagrangian import LagrangianSolver
+from benders_auction.population import as_agents, exposes_valuations, agent_bids, PopulationAgent
+
+__author__ = 'Usiel'
+
+
+class CompressedAgent(ManualAgent):
+    def __init__(self, agent):
+        """
+        CompressedAgent only keeps the undominated valuations of an agent. A valuation is dominated if its value does \
+        not exceed the value of a smaller quantity (or 0 for the empty bundle). Under free disposal such a bundle is \
+        never strictly preferred, so it can be dropped without any loss in social welfare.
+        :param agent: Agent to compress (needs valuations).
+        """
+        self.original = agent
+        quantities, values = agent_bids(agent)
+        kept = []
+        best_value = 0.
+        for quantity, value in zip(quantities, values):
+            if value > best_value:
+                kept.append(Valuation(quantity, value))
+                best_value = value
+
+        ManualAgent.__init__(self, kept, agent.id)
+        self.bundles_before = len(quantities)
+
+        # representatives maps every original quantity to the largest kept bundle not exceeding it
+        self.representatives = dict((quantity, self.representative(quantity)) for quantity in quantities)
+
+    def representative(self, quantity):
+        """
+        :param quantity: Any quantity.
+        :return: Returns the kept Valuation worth as much as quantity under free disposal (empty bundle if none).
+        """
+        try:
+            return self.representatives[quantity]
+        except (AttributeError, KeyError):
+            best_valuation = Valuation(0, 0.)
+            for valuation in self.valuations:
+                if valuation.quantity <= quantity:
+                    best_valuation = valuation
+            return best_valuation
+
+    def calculate_marginal_value(self, additional_quantity, quantity_owned):
+        return self.representative(quantity_owned + additional_quantity).valuation - \
+               (self.representative(quantity_owned).valuation if quantity_owned > 0 else 0.)
+
+    def calculate_value(self, quantity):
+        """
+        Returns the free disposal valuation for a quantity, i.e. the best kept bundle not larger than quantity.
+        :param quantity: Quantity we want to know valuation for.
+        :return: Returns Valuation (quantity of the bundle actually needed).
+        """
+        return self.representative(quantity)
+
+
+def compress_agent(agent):
+    """
+    :param agent: Agent to compress.
+    :return: Returns CompressedAgent or agent itself if it is already compressed (including rows of a \
+    BreakpointPopulation), is traced (its queries have to reach it, see trace), does not expose its valuations or \
+    bids on bundles of several items (dominance is only defined for a single item).
+    """
+    if isinstance(agent, CompressedAgent) or getattr(agent, 'free_disposal', False) or \
+            getattr(agent, 'traced', False) or not exposes_valuations(agent) or \
+            any(isinstance(quantity, tuple) for quantity in agent_bids(agent)[0]):
+        return agent
+    return CompressedAgent(agent)
+
+
+class ValuationPreprocessor:
+    def __init__(self, agents, log=BlackHoleLogger()):
+        """
+        Removes dominated bundles of all agents before solving. Keeps track of representatives, so allocations \
+        computed on the compressed instance can be translated back.
+        :param agents: List of agents or AgentPopulation.
+        :param log: Logger for the report.
+        """
+        self.agents = [compress_agent(agent) for agent in as_agents(agents)]
+        self.agents_by_id = dict((agent.id, agent) for agent in self.agents)
+        self.log = log
+
+        compressed = [agent for agent in self.agents if isinstance(agent, CompressedAgent)]
+        self.bundles_before = sum(agent.bundles_before for agent in compressed)
+        self.bundles_after = sum(len(agent.valuations) for agent in compressed)
+
+        self.print_report()
+
+    def extend(self, agents):
+        """
+        Adds agents joining after preprocessing (e.g. agents readmitted by a new screen).
+        :param agents: List of agents.
+        :return: Returns the added agents as preprocessed.
+        """
+        added = [compress_agent(agent) for agent in agents]
+        self.agents += added
+        self.agents_by_id.update((agent.id, agent) for agent in added)
+        return added
+
+    @property
+    def bundles_removed(self):
+        return self.bundles_before - self.bundles_after
+
+    @property
+    def shrinkage(self):
+        """
+        :return: Returns share of bundles removed (0 to 1).
+        """
+        if not self.bundles_before:
+            return 0.
+        return float(self.bundles_removed) / self.bundles_before
+
+    def translate(self, allocation):
+        """
+        Maps every assignment to the representative bundle actually needed by the agent (under free disposal).
+        :param allocation: Allocation on compressed instance.
+        :return: Returns Allocation only containing kept bundles.
+        """
+        assignments = []
+        for assignment in allocation.assignments:
+            agent = self.agents_by_id.get(assignment.agent_id)
+            if isinstance(agent, CompressedAgent):
+                representative = agent.representative(assignment.quantity)
+                if representative.quantity > 0:
+                    assignments.append(Assignment(representative.quantity, assignment.agent_id,
+                                                  assignment.valuation, assignment.count))
+            else:
+                assignments.append(assignment)
+        return Allocation(assignments, allocation.probability)
+
+    def print_report(self):
+        self.log.log('Preprocessing removed %s of %s bundles (%.1f%%)' %
+                     (self.bundles_removed, self.bundles_before, 100. * self.shrinkage))
+
+
+class BidderScreen:
+    def __init__(self, agents, supply, log=BlackHoleLogger()):
+        """
+        Removes agents that cannot win anything. In every optimal LP solution an agent only gets j items if \
+        v(j) - p*j = u >= 0 at the LP price p, so an agent whose best per-unit value max_j v(j)/j is below p gets \
+        nothing, its utility is 0 and (as removing it does not change the optimum) so is its VCG price. The LP price \
+        of the agents exposing their valuations (see LagrangianSolver) bounds p from below, more agents only raise \
+        demand. It is at least the (supply+1)-th largest per-unit value, as that many agents would all demand items \
+        below it.
+        :param agents: List of agents or AgentPopulation.
+        :param supply: Supply up for auction (a larger supply may let screened agents win). Nobody is screened if \
+        supply is a dict of several items, the bound only holds for a single item.
+        :param log: Logger for the report.
+        """
+        agents = as_agents(agents)
+        self.supply = supply
+        self.log = log
+        self.agents = []
+        self.screened = []
+        if isinstance(supply, dict):
+            self.price_bound = 0.
+            self.agents = list(agents)
+            self.print_report()
+            return
+        visible = [agent for agent in agents if exposes_valuations(agent)]
+        self.price_bound = LagrangianSolver(supply, visible).price if visible else 0.
+        for agent in agents:
+            if exposes_valuations(agent) and self.best_unit_value(agent) < self.price_bound * (1. - epsilon):
+                self.screened.append(agent)
+            else:
+                self.agents.append(agent)
+
+        self.print_report()
+
+    def best_unit_value(self, agent):
+        """
+        :param agent: Agent exposing valuations.
+        :return: Returns max_j v(j)/j over bundles not exceeding supply.
+        """
+        quantities, values = agent_bids(agent, self.supply)
+        return max([float(value) / quantity for quantity, value in zip(quantities, values) if quantity > 0] or [0.])
+
+    @property
+    def screened_ids(self):
+        return set(agent.id for agent in self.screened)
+
+    def print_report(self):
+        self.log.log('Screening removed %s of %s agents (best per-unit value below %s)' %
+                     (len(self.screened), len(self.screened) + len(self.agents), self.price_bound))
@@ -0,0 +1,267 @@
+import json
+import Queue
+import socket
+import SocketServer
+import threading
+import time
+
+from benders_auction.agent import QueryCache
+from benders_auction.common import Valuation
+
+__author__ = 'Usiel'
+
+# methods of the agent interface which may be asked over the network
+QUERY_METHODS = ['query_demand', 'query_relative_demand', 'query_demand_set', 'marginal_value_query', 'query_value']
+
+
+class OracleTimeout(Exception):
+    pass
+
+
+class OracleError(Exception):
+    pass
+
+
+def encode_result(result):
+    """
+    :param result: Answer of an agent (Valuation, set of Valuation, number or None).
+    :return: Returns JSON serializable answer.
+    """
+    if isinstance(result, Valuation):
+        return [result.quantity, result.valuation]
+    if isinstance(result, (set, list)):
+        return [encode_result(valuation) for valuation in result]
+    return result
+
+
+def decode_result(method, result):
+    """
+    :param method: Query method the result belongs to.
+    :param result: Answer as received over the network.
+    :return: Returns answer as a local agent would have returned it.
+    """
+    if result is None or method == 'marginal_value_query':
+        return result
+    if method == 'query_demand_set':
+        return set(Valuation(quantity, valuation) for quantity, valuation in result)
+    return Valuation(result[0], result[1])
+
+
+class QueryFuture:
+    def __init__(self, method, callback=None):
+        """
+        QueryFuture holds the answer of a query which is still on its way.
+        :param method: Query method (needed to decode answer).
+        :param callback: Optional function called with the decoded answer once it arrived.
+        """
+        self.method = method
+        self.callback = callback
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+    def set_result(self, value):
+        self.value = decode_result(self.method, value)
+        if self.callback:
+            self.callback(self.value)
+        self.event.set()
+
+    def set_answer(self, value):
+        """
+        Resolves the future with an answer which is already decoded (e.g. from a cache).
+        """
+        self.value = value
+        self.event.set()
+
+    def set_error(self, error):
+        self.error = error
+        self.event.set()
+
+    def result(self, timeout=None):
+        """
+        Waits for the answer.
+        :param timeout: Optional time in seconds to wait at most.
+        :return: Returns decoded answer or raises error of query.
+        """
+        if not self.event.wait(timeout):
+            raise OracleTimeout('no answer for %s within %ss' % (self.method, timeout))
+        if self.error:
+            raise self.error
+        return self.value
+
+
+class OracleClient:
+    def __init__(self, address, max_in_flight=16, timeout=1.):
+        """
+        OracleClient sends queries to remote agents. Each of max_in_flight worker threads holds its own connection, \
+        so at most max_in_flight queries are on their way at the same time.
+        :param address: (host, port) of the remote agents.
+        :param max_in_flight: Maximal number of concurrent queries.
+        :param timeout: Time in seconds after which a single query fails with OracleTimeout.
+        """
+        self.address = address
+        self.timeout = timeout
+        self.requests = Queue.Queue()
+        self.workers = [threading.Thread(target=self.work) for i in range(0, max_in_flight)]
+        for worker in self.workers:
+            worker.daemon = True
+            worker.start()
+
+    def submit(self, agent_id, method, args, callback=None):
+        """
+        :param agent_id: Identifier of remote agent.
+        :param method: One of QUERY_METHODS.
+        :param args: Arguments of query.
+        :param callback: Optional function called with the decoded answer.
+        :return: Returns QueryFuture.
+        """
+        future = QueryFuture(method, callback)
+        self.requests.put((future, json.dumps({'agent': agent_id, 'method': method, 'args': list(args)})))
+        return future
+
+    def work(self):
+        connection = None
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            future, message = request
+            try:
+                if not connection:
+                    connection = socket.create_connection(self.address, self.timeout)
+                    reader = connection.makefile('r')
+                connection.sendall(message + '\n')
+                response = json.loads(reader.readline())
+                if 'error' in response:
+                    future.set_error(OracleError(response['error']))
+                else:
+                    future.set_result(response['result'])
+            except Exception as e:
+                # a late answer would be read by the next query, so we start over with a new connection
+                if connection:
+                    connection.close()
+                connection = None
+                if isinstance(e, socket.timeout):
+                    future.set_error(OracleTimeout('no answer for %s within %ss' % (future.method, self.timeout)))
+                else:
+                    future.set_error(OracleError('%s: %s' % (type(e).__name__, e)))
+        if connection:
+            connection.close()
+
+    def close(self):
+        for worker in self.workers:
+            self.requests.put(None)
+
+
+class RemoteAgent:
+    def __init__(self, client, identifier, cache_size=4096):
+        """
+        RemoteAgent is a local proxy for an agent answering its queries over the network. Answers are remembered, \
+        so the same question never travels twice.
+        :param client: OracleClient connected to the agent.
+        :param identifier: Identifier of the remote agent.
+        :param cache_size: Number of answers remembered (see QueryCache).
+        """
+        self.client = client
+        self.id = identifier
+        self.cache = QueryCache(cache_size)
+
+    @property
+    def concurrent(self):
+        """
+        :return: Returns True, as queries can be submitted without waiting for the answer (see gather_queries).
+        """
+        return True
+
+    def submit(self, method, *args):
+        key = (method,) + args
+        known, answer = self.cache.lookup(key)
+        if known:
+            future = QueryFuture(method)
+            future.set_answer(answer)
+            return future
+        return self.client.submit(self.id, method, args, lambda value: self.cache.store(key, value))
+
+    def query_demand(self, price, left_supply, base_price):
+        return self.submit('query_demand', price, left_supply, base_price).result()
+
+    def query_relative_demand(self, price, left_supply, base_price):
+        return self.submit('query_relative_demand', price, left_supply, base_price).result()
+
+    def query_demand_set(self, price, left_supply):
+        return self.submit('query_demand_set', price, left_supply).result()
+
+    def marginal_value_query(self, additional_quantity, quantity_owned):
+        return self.submit('marginal_value_query', additional_quantity, quantity_owned).result()
+
+    def query_value(self, quantity):
+        return self.submit('query_value', quantity).result()
+
+
+def gather_queries(queries):
+    """
+    Asks independent queries at once. Queries to remote agents are all submitted before waiting for any answer, \
+    so a round takes about one round trip instead of one per agent.
+    :param queries: List of (agent, method, args).
+    :return: Returns list of answers (same order as queries).
+    """
+    futures = [agent.submit(method, *args) if getattr(agent, 'concurrent', False) else None
+               for agent, method, args in queries]
+    return [future.result() if future else getattr(agent, method)(*args)
+            for future, (agent, method, args) in zip(futures, queries)]
+
+
+class AgentRequestHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        for line in iter(self.rfile.readline, ''):
+            request = json.loads(line)
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            try:
+                if request['method'] not in QUERY_METHODS:
+                    raise OracleError('unknown method %s' % request['method'])
+                agent = self.server.agents[request['agent']]
+                response = {'result': encode_result(getattr(agent, request['method'])(*request['args']))}
+            except Exception as e:
+                response = {'error': '%s: %s' % (type(e).__name__, e)}
+            self.wfile.write(json.dumps(response) + '\n')
+            self.wfile.flush()
+
+
+class AgentServer(SocketServer.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # every worker of an OracleClient connects at once
+    request_queue_size = 128
+
+    def __init__(self, agents, latency=0., address=('127.0.0.1', 0)):
+        """
+        AgentServer is an in-process stand-in for remote agents, it answers queries with local agents.
+        :param agents: List of agents to serve.
+        :param latency: Seconds each answer is delayed (simulated network and bidder latency).
+        :param address: (host, port) to listen on, port 0 picks a free port.
+        """
+        SocketServer.ThreadingTCPServer.__init__(self, address, AgentRequestHandler)
+        self.agents = dict((agent.id, agent) for agent in agents)
+        self.agent_ids = [agent.id for agent in agents]
+        self.latency = latency
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def connect(self, max_in_flight=16, timeout=1.):
+        """
+        :param max_in_flight: Maximal number of concurrent queries.
+        :param timeout: Time in seconds after which a single query fails.
+        :return: Returns list of RemoteAgent for all served agents.
+        """
+        client = OracleClient(self.server_address, max_in_flight, timeout)
+        return [RemoteAgent(client, identifier) for identifier in self.agent_ids]
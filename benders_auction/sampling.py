@@ -0,0 +1,115 @@
+from benders_auction.backends import np
+from benders_auction.common import Allocation
+
+__author__ = 'Usiel'
+
+
+class LotterySampler:
+    def __init__(self, allocations, seed=None, rng=None, agent_ids=None):
+        """
+        LotterySampler draws realized allocations from a solved lottery. Every allocation of positive probability is \
+        kept (expanded class lotteries split their mass finely). Probabilities are normalized once: mass missing to \
+        1 goes to the empty allocation (the lottery does not allocate it), a total above 1 (numerical noise) is \
+        scaled down. An alias table (Vose) makes every draw O(1).
+        :param allocations: Dict of Allocation (e.g. as returned by BendersSolver.solve).
+        :param seed: Seed for a new numpy.random.RandomState (ignored if rng given).
+        :param rng: Optional random generator providing randint(low, high, size) and random_sample(size).
+        :param agent_ids: Agents to report quantities for (default are all agents in the lottery).
+        """
+        self.rng = rng if rng is not None else np.random.RandomState(seed)
+        self.names = []
+        self.allocations = []
+        probabilities = []
+        for name, allocation in sorted(allocations.iteritems()):
+            if allocation.probability > 0:
+                self.names.append(name)
+                self.allocations.append(allocation)
+                probabilities.append(float(allocation.probability))
+
+        total = sum(probabilities)
+        if total < 1.:
+            self.names.append(None)
+            self.allocations.append(Allocation([], 1. - total))
+            probabilities.append(1. - total)
+        self.probabilities = np.array(probabilities) / max(total, 1.)
+        self.probability_table, self.alias_table = alias_tables(self.probabilities)
+
+        if agent_ids is None:
+            agent_ids = sorted(set(assignment.agent_id for allocation in self.allocations
+                                   for assignment in allocation.assignments))
+        self.agent_ids = list(agent_ids)
+        column = dict((agent_id, j) for j, agent_id in enumerate(self.agent_ids))
+        # quantities[k, j] and values[k, j] are what agent j gets in allocation k
+        self.quantities = np.zeros((len(self.allocations), len(self.agent_ids)))
+        self.values = np.zeros((len(self.allocations), len(self.agent_ids)))
+        for k, allocation in enumerate(self.allocations):
+            for assignment in allocation.assignments:
+                if assignment.agent_id in column:
+                    self.quantities[k, column[assignment.agent_id]] += assignment.quantity * assignment.count
+                    self.values[k, column[assignment.agent_id]] += assignment.valuation * assignment.count
+
+    def draw(self):
+        """
+        :return: Returns index of a drawn allocation (see allocations and names).
+        """
+        k = self.rng.randint(0, len(self.allocations))
+        return k if self.rng.random_sample() < self.probability_table[k] else self.alias_table[k]
+
+    def draw_many(self, count):
+        """
+        :param count: Number of draws.
+        :return: Returns array of count indices of drawn allocations.
+        """
+        k = self.rng.randint(0, len(self.allocations), count)
+        return np.where(self.rng.random_sample(count) < self.probability_table[k], k, self.alias_table[k])
+
+    def draw_allocation(self):
+        return self.allocations[self.draw()]
+
+    def realized_quantities(self, count):
+        """
+        :param count: Number of draws.
+        :return: Returns dict(agent_id: array of the quantities the agent got in count draws).
+        """
+        quantities = self.quantities[self.draw_many(count)]
+        return dict((agent_id, quantities[:, j]) for j, agent_id in enumerate(self.agent_ids))
+
+    def realized_values(self, count):
+        """
+        :param count: Number of draws.
+        :return: Returns dict(agent_id: array of the values the agent realized in count draws).
+        """
+        values = self.values[self.draw_many(count)]
+        return dict((agent_id, values[:, j]) for j, agent_id in enumerate(self.agent_ids))
+
+    def realized_welfare(self, count):
+        """
+        :param count: Number of draws.
+        :return: Returns array of the social welfare of count draws.
+        """
+        return self.values.sum(axis=1)[self.draw_many(count)]
+
+
+def alias_tables(probabilities):
+    """
+    Builds the alias tables of Vose's method: column k is taken with probability_table[k], else alias_table[k].
+    :param probabilities: Array of probabilities (sum 1).
+    :return: Returns (probability_table, alias_table).
+    """
+    count = len(probabilities)
+    scaled = probabilities * count
+    probability_table = np.ones(count)
+    alias_table = np.arange(count)
+    small = [k for k in range(count) if scaled[k] < 1.]
+    large = [k for k in range(count) if scaled[k] >= 1.]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        probability_table[less] = scaled[less]
+        alias_table[less] = more
+        scaled[more] -= 1. - scaled[less]
+        if scaled[more] < 1.:
+            small.append(more)
+        else:
+            large.append(more)
+    # what is left is 1 up to rounding
+    return probability_table, alias_table
@@ -0,0 +1,144 @@
+import multiprocessing
+from collections import namedtuple
+from multiprocessing.sharedctypes import RawArray
+
+from benders_auction.backends import np
+
+from benders_auction.common import epsilon
+from benders_auction.population import agent_bids
+
+__author__ = 'Usiel'
+
+# quantities/values are views on shared memory, they are overwritten by the next round
+DemandRound = namedtuple('DemandRound', ['quantities', 'values', 'min_quantities', 'max_quantities',
+                                         'total_demand', 'total_min_demand', 'total_max_demand'])
+
+
+def shared_array(typecode, shape):
+    """
+    :param typecode: 'd' for float64 or 'l' for int64.
+    :param shape: Shape of array.
+    :return: Returns (shared buffer, numpy view on buffer).
+    """
+    buffer = RawArray(typecode, int(np.prod(shape)))
+    return buffer, np.frombuffer(buffer, dtype=np.float64 if typecode == 'd' else np.int64).reshape(shape)
+
+
+def shard_worker(buffers, shape, start, stop, connection):
+    """
+    Long-lived worker answering demand queries for the agents start to stop-1. Valuations and results are shared \
+    memory, only (price, left_supply) and the partial aggregates go through the pipe.
+    """
+    values = np.frombuffer(buffers['values']).reshape(shape)[start:stop]
+    results = dict((name, np.frombuffer(buffers[name], dtype=np.int64 if name != 'best_values' else np.float64)
+                    [start:stop]) for name in ['quantities', 'best_values', 'min_quantities', 'max_quantities'])
+    quantities = np.arange(1, shape[1] + 1)
+    rows = np.arange(0, stop - start)
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        price, left_supply = message
+        left_supply = min(left_supply, shape[1])
+        if left_supply < 1:
+            for name in results:
+                results[name][:] = 0
+            connection.send((0, 0, 0))
+            continue
+        utilities = values[:, :left_supply] - price * quantities[:left_supply]
+        best_utilities = utilities.max(axis=1)
+
+        # as ManualAgent.query_demand: the largest quantity of maximal utility (if utility >= -epsilon)
+        best = left_supply - 1 - np.argmax(utilities[:, ::-1] >= best_utilities[:, None], axis=1)
+        demanded = best_utilities >= -epsilon
+        results['quantities'][:] = np.where(demanded, best + 1, 0)
+        results['best_values'][:] = np.where(demanded, values[rows, best], 0.)
+
+        # as ManualAgent.query_demand_set: all quantities within epsilon of maximal (non-negative) utility
+        in_set = (utilities + epsilon >= best_utilities[:, None]) & (utilities + epsilon >= 0)
+        non_empty = in_set.any(axis=1)
+        results['min_quantities'][:] = np.where(non_empty, np.argmax(in_set, axis=1) + 1, 0)
+        results['max_quantities'][:] = np.where(non_empty, left_supply - np.argmax(in_set[:, ::-1], axis=1), 0)
+
+        connection.send((results['quantities'].sum(), results['min_quantities'].sum(),
+                         results['max_quantities'].sum()))
+    connection.close()
+
+
+class ShardedAgentPool:
+    def __init__(self, ids, values, workers=None):
+        """
+        ShardedAgentPool keeps the valuations of a large population in shared memory, split across long-lived \
+        worker processes. Each round only broadcasts the price and gathers partial aggregates.
+        :param ids: Sequence of agent ids.
+        :param values: Matrix (agents x supply) with values[i, j-1] = v_i(j), -inf for bundles not bid on.
+        :param workers: Number of worker processes (default is number of cores).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        self.ids = np.asarray(ids)
+        self.index = dict((agent_id, i) for i, agent_id in enumerate(self.ids))
+        self.shape = values.shape
+
+        self.buffers = dict()
+        self.buffers['values'], shared_values = shared_array('d', self.shape)
+        shared_values[:] = values
+        self.buffers['best_values'], self.best_values = shared_array('d', (self.shape[0],))
+        self.buffers['quantities'], self.quantities = shared_array('l', (self.shape[0],))
+        self.buffers['min_quantities'], self.min_quantities = shared_array('l', (self.shape[0],))
+        self.buffers['max_quantities'], self.max_quantities = shared_array('l', (self.shape[0],))
+
+        workers = min(workers or multiprocessing.cpu_count(), max(1, self.shape[0]))
+        bounds = np.linspace(0, self.shape[0], workers + 1).astype(int)
+        self.connections = []
+        self.processes = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=shard_worker,
+                                              args=(self.buffers, self.shape, start, stop, worker_connection))
+            process.daemon = True
+            process.start()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    @classmethod
+    def from_agents(cls, agents, supply, workers=None):
+        """
+        :param agents: List of agents (need valuations) or AgentPopulation.
+        :param supply: Supply up for auction.
+        :param workers: Number of worker processes.
+        :return: Returns ShardedAgentPool holding the agents' valuations.
+        """
+        if hasattr(agents, 'dense_values'):
+            values = np.full((len(agents), supply), -np.inf)
+            columns = min(supply, agents.supply)
+            values[:, :columns] = agents.dense_values()[:, :columns]
+            return cls(agents.ids, values, workers)
+        values = np.full((len(agents), supply), -np.inf)
+        for i, agent in enumerate(agents):
+            for quantity, value in zip(*agent_bids(agent, supply)):
+                if quantity > 0:
+                    values[i, quantity - 1] = value
+        return cls([agent.id for agent in agents], values, workers)
+
+    def query_demands(self, price, left_supply):
+        """
+        Asks all agents for their demand at price (in parallel across shards).
+        :param price: Current price-per-item.
+        :param left_supply: Supply available at the moment.
+        :return: Returns DemandRound.
+        """
+        for connection in self.connections:
+            connection.send((price, left_supply))
+        totals = np.array([connection.recv() for connection in self.connections]).sum(axis=0)
+        return DemandRound(self.quantities, self.best_values, self.min_quantities, self.max_quantities,
+                           totals[0], totals[1], totals[2])
+
+    def value(self, agent_id, quantity):
+        return np.frombuffer(self.buffers['values']).reshape(self.shape)[self.index[agent_id], quantity - 1]
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+        for process in self.processes:
+            process.join()
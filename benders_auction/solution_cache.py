@@ -0,0 +1,163 @@
+import errno
+import fcntl
+import hashlib
+import json
+import os
+
+from benders_auction.aggregation import valuation_key
+from benders_auction.common import Assignment, Allocation, epsilon
+
+__author__ = 'Usiel'
+
+CACHE_VERSION = 3
+
+
+class SolutionCache:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        """
+        SolutionCache keeps solved economies on disk, keyed by a hash of everything the solution depends on \
+        (including the solver options changing the lottery). Only converged solves are stored. Agent ids are not \
+        part of the key, so an economy is found again whatever its agents are called. Files are replaced atomically \
+        and eviction is guarded by a file lock, so several processes may share a directory.
+        :param directory: Directory holding the cache (created if missing).
+        :param max_bytes: Size at which least recently used solutions are evicted.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def canonical_agents(self, solver):
+        """
+        :param solver: BendersSolver.
+        :return: Returns solver's agents (or classes) in canonical order, None if an agent hides its valuations.
+        """
+        keys = [(valuation_key(agent), getattr(agent, 'multiplicity', 1)) for agent in solver.agents]
+        if any(key[0] is None for key in keys):
+            return None
+        return [agent for key, agent in sorted(zip(keys, solver.agents), key=lambda item: item[0])]
+
+    def key(self, solver):
+        """
+        :param solver: BendersSolver (not solved yet).
+        :return: Returns hex digest identifying the economy or None if it cannot be cached (agents hiding their \
+        valuations or several items).
+        """
+        agents = self.canonical_agents(solver)
+        if agents is None or isinstance(solver.supply, dict):
+            return None
+        economy = [CACHE_VERSION, solver.supply, repr(epsilon), type(solver.approximator).__name__,
+                   repr(solver.approximator.gap), solver.classes is not None, solver.preprocessor is not None,
+                   solver.on_cycle, solver.seed_points, solver.speculation,
+                   [[[quantity, repr(value)] for quantity, value in valuation_key(agent)] +
+                    [getattr(agent, 'multiplicity', 1)] for agent in agents]]
+        return hashlib.sha256(json.dumps(economy, separators=(',', ':'))).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, '%s.json' % key)
+
+    def load(self, key, solver):
+        """
+        :param key: Key as returned by key(solver).
+        :param solver: BendersSolver the cached solution is mapped onto, it gets the cached bounds (see gap).
+        :return: Returns (dict of Allocation over single agents, E[social welfare]) or None if not cached.
+        """
+        try:
+            with open(self.path(key)) as source:
+                record = json.load(source)
+            # touching marks the solution as recently used
+            os.utime(self.path(key), None)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        solver.lower_bound, solver.upper_bound = record['lower_bound'], record['upper_bound']
+        # only converged solves are stored
+        solver.converged = True
+
+        agents = self.canonical_agents(solver)
+        allocations = dict()
+        for name, allocation in record['allocations'].iteritems():
+            allocations[name] = Allocation([Assignment(quantity, agents[index].id, valuation, count)
+                                            for index, quantity, valuation, count in allocation['assignments']],
+                                           allocation['probability'])
+        return solver.expand(allocations), record['welfare']
+
+    def store(self, key, solver):
+        """
+        Stores the solution of a solved solver.
+        :param key: Key as returned by key(solver).
+        :param solver: BendersSolver after solve.
+        """
+        agents = self.canonical_agents(solver)
+        index = dict((agent.id, position) for position, agent in enumerate(agents))
+        utilities = solver.utilities
+        record = {'welfare': -solver.objective,
+                  'lower_bound': solver.lower_bound,
+                  'upper_bound': solver.upper_bound,
+                  'price': solver.price,
+                  'utilities': [utilities[agent.id] for agent in agents],
+                  'allocations': dict((name, {'probability': allocation.probability,
+                                              'assignments': [[index[assignment.agent_id], assignment.quantity,
+                                                               assignment.valuation, assignment.count]
+                                                              for assignment in allocation.assignments]})
+                                      for name, allocation in solver.allocations.iteritems()
+                                      if allocation.probability > 0)}
+        temporary = '%s.%s.tmp' % (self.path(key), os.getpid())
+        with open(temporary, 'w') as output:
+            json.dump(record, output)
+        os.rename(temporary, self.path(key))
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used solutions until the cache fits into max_bytes.
+        """
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    try:
+                        status = os.stat(os.path.join(self.directory, name))
+                    except OSError:
+                        continue
+                    entries.append((status.st_mtime, status.st_size, name))
+            total = sum(size for mtime, size, name in entries)
+            for mtime, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    self.evictions += 1
+                except OSError:
+                    pass
+                total -= size
+
+    def solve(self, solver, time_budget=None, target_gap=None):
+        """
+        Solves with solver unless the economy is cached. Solves stopped by a budget, a cycle or the iteration limit \
+        are not cached.
+        :param solver: BendersSolver.
+        :param time_budget: Optional time budget in seconds.
+        :param target_gap: Optional relative gap.
+        :return: Returns (dict of Allocation, E[social welfare]).
+        """
+        key = self.key(solver) if time_budget is None and target_gap is None else None
+        if key:
+            cached = self.load(key, solver)
+            if cached:
+                return cached
+        allocations = solver.solve(time_budget, target_gap)
+        if key and solver.converged:
+            self.store(key, solver)
+        return allocations, -solver.objective
+
+    def print_report(self, log):
+        log.log('Solution cache: %s hits, %s misses, %s evictions' % (self.hits, self.misses, self.evictions))
@@ -0,0 +1,1215 @@
+import math
+import pprint
+import random
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from benders_auction.backends import gp, np
+from benders_auction.checkpoint import write_snapshot, read_snapshot, encode_allocations, decode_allocations, \
+    revalue_allocation
+from benders_auction.common import Assignment, epsilon, Allocation, ConsoleLogger, BlackHoleLogger, Valuation, \
+    bundle_items, bundle_cost, bundle_name, item_supply, fits
+from benders_auction.aggregation import aggregate_agents, expand_allocations
+from benders_auction.lagrangian import LagrangianSolver
+from benders_auction.model_pool import model_pool
+from benders_auction.population import as_agents, exposes_valuations
+from benders_auction.preprocessing import ValuationPreprocessor, BidderScreen
+from benders_auction.remote import gather_queries
+
+__author__ = 'Usiel'
+iteration_abort_threshold = 100
+# responses of BendersSolver when the approximator only returns allocations already cut
+CYCLE_RESPONSES = ['terminate', 'perturb', 'switch']
+
+# lottery is a dict of Allocation (over the single agents) with positive probability
+SolverProgress = namedtuple('SolverProgress', ['iteration', 'lower_bound', 'upper_bound', 'gap', 'lottery', 'elapsed'])
+SweepPoint = namedtuple('SweepPoint', ['supply', 'welfare', 'price', 'lower_bound', 'upper_bound', 'allocations',
+                                       'iterations'])
+
+class BendersSolver:
+    def __init__(self, supply, agents, approximator, log, preprocess=True, aggregate=True, seed_points=0,
+                 screen=True, on_cycle='terminate', perturbation=.05, perturbation_attempts=3, speculation=0,
+                 seed_baseline=False):
+        """
+        :param b: b of LP. If n=len(agents) then the first n values are 1./alpha and n+1 value is supply/alpha.
+        :param supply: Supply up for auction or dict(item: supply) if there are several item types. Then every item \
+        has a price variable, b ends with supply[item]/alpha for every item and agents bid on bundles (see \
+        BundleAgent and LaviSwamyGreedyApproximator.allocate_bundles, a heuristic: bounds and gap are not certified). \
+        Seeding and screening only apply to a single item.
+        :param agents: List of agents or AgentPopulation.
+        :param preprocess: If True dominated bundles are removed before solving (see ValuationPreprocessor).
+        :param aggregate: If True agents with identical valuations are solved as one AgentClass. The i-th value of b \
+        is then multiplicity/alpha.
+        :param seed_points: Number of prices around an estimated clearing price at which allocations are inserted as \
+        cuts before the first iteration (0 disables seeding).
+        :param screen: If True agents that cannot win anything are removed before solving (see BidderScreen), their \
+        allocations and utilities are 0. They are screened again if the supply grows (see set_supply).
+        :param on_cycle: What to do when the approximator returns an allocation whose cut is already in the master \
+        problem (the master would not change, so neither would the duals): 'terminate' stops with the certified gap, \
+        'perturb' asks the approximator at randomly perturbed duals and 'switch' asks the other greedy approximator. \
+        Both stop as well if they find no new violated cut.
+        :param perturbation: Relative size of dual perturbations.
+        :param perturbation_attempts: Number of perturbed duals tried per cycle.
+        :param speculation: Number of predicted dual points at which threads ask the approximator while the master \
+        problem is optimized (0 disables pipelining, see speculate).
+        :param seed_baseline: If True a seeded solve is repeated without seeds once it is done, so the summary reports \
+        the iterations seeding saved (see unseeded_iterations). This doubles the solve time.
+        """
+        if on_cycle not in CYCLE_RESPONSES:
+            raise ValueError('unknown cycle response %s (one of %s)' % (on_cycle, ', '.join(CYCLE_RESPONSES)))
+        self.on_cycle = on_cycle
+        self.perturbation = perturbation
+        self.perturbation_attempts = perturbation_attempts
+        # queries of a ShardedAgentPool must not interleave, so pooled approximators are never pipelined
+        self.speculation = speculation if not getattr(approximator, 'pool', None) else 0
+        # duals (price, utilities) of the last two master solves, speculation extrapolates from them
+        self.dual_history = []
+        self.speculative_calls = 0
+        self.speculative_hits = 0
+        self.approximator = approximator
+        self.log = log
+        self.supply = supply
+        # the LP price bounding the screen is only defined for a single item
+        self.screen = BidderScreen(agents, supply, log) if screen and not isinstance(supply, dict) else None
+        if self.screen:
+            agents = self.screen.agents
+        self.preprocessor = ValuationPreprocessor(agents, log) if preprocess else None
+        agents = self.preprocessor.agents if preprocess else as_agents(agents)
+        self.classes = aggregate_agents(agents) if aggregate else None
+        self.agents = self.classes if aggregate else agents
+        if aggregate:
+            self.log.log('%s agents aggregated into %s classes' % (len(agents), len(self.classes)))
+        # the approximator has to query the same (compressed) agents or classes
+        self.approximator.agents = self.agents
+
+        self.allocations = {'X0': Allocation()}
+        # canonical key (see Allocation.key) to name of every allocation in allocations
+        self.allocation_names = dict()
+
+        self.b = [(getattr(agent, 'multiplicity', 1) / self.approximator.gap) for agent in self.agents]
+        # the single item is None
+        self.items = sorted(supply) if isinstance(supply, dict) else [None]
+        self.b += [item_supply(supply)[item] / self.approximator.gap for item in self.items]
+
+        # Setting up master problem, masters of the same width reuse their variables (see ModelPool)
+        self.m, variables = model_pool().acquire("master-problem", [(-gp.GRB.INFINITY, gp.GRB.INFINITY, "z")] +
+                                                 [(-gp.GRB.INFINITY, 0, "p_%s" % item if item is not None else "price")
+                                                  for item in self.items] +
+                                                 [(-gp.GRB.INFINITY, 0, "u_%s" % agent.id) for agent in self.agents])
+        self.m.params.LogToConsole = 0
+        self.z = variables[0]
+        self.price_vars = OrderedDict(zip(self.items, variables[1:len(self.items) + 1]))
+        self.price_var = variables[1]
+        # ordered, as the utility variables are zipped with b
+        self.utility_vars = OrderedDict((agent.id, variable) for agent, variable
+                                        in zip(self.agents, variables[len(self.items) + 1:]))
+
+        # Initial constraints for empty allocation
+        self.add_benders_cut(Allocation(), "X0")
+        self.old_price_constraint = 0.
+        self.add_price_constraint(0.)
+        self.m.setObjective(self.z, gp.GRB.MAXIMIZE)
+
+        self.iteration = 0
+        # iteration at which the current solve started (see set_supply)
+        self.iteration_offset = 0
+        self.seed_names = []
+        self.seed_time = 0.
+        self.seed_points = seed_points
+        self.seed_baseline = seed_baseline
+        # iterations the same economy needs without seeds (see unseeded_iterations)
+        self.baseline_iterations = None
+        # clearing prices are only estimated for a single item
+        if seed_points > 0 and self.items == [None]:
+            self.seed(supply, seed_points)
+
+        self.price_changed = False
+        self.lower_bound = 0.
+        self.upper_bound = float('inf')
+        # approximator answers already cut (no master solve or cut was spent on them) and cycles left by a new cut
+        self.duplicates_skipped = 0
+        self.cycles_broken = 0
+        # True once a solve ended because no cut was violated (not by a budget, a cycle or the iteration limit)
+        self.converged = False
+        self.checkpoint_path = None
+        self.checkpoint_interval = None
+        # time (see time.time) by which master solves have to be done, set by progress
+        self.deadline = None
+
+    @property
+    def price(self):
+        """
+        :return: Returns current price (positive) or dict(item: price) if there are several items.
+        """
+        prices = self.prices
+        if prices is None:
+            return None
+        return self.price_point(prices)
+
+    @property
+    def prices(self):
+        """
+        :return: Returns current prices (positive): dict(item: price), the single item is None.
+        """
+        try:
+            return OrderedDict((item, math.fabs(variable.x)) for item, variable in self.price_vars.iteritems())
+        except gp.GurobiError:
+            return None
+
+    def price_point(self, prices):
+        """
+        :param prices: Dict(item: price).
+        :return: Returns prices as the approximator expects them (a number for the single item).
+        """
+        return prices[None] if self.items == [None] else prices
+
+    @property
+    def utilities(self):
+        """
+        :return: Returns current utilities (positive): dict(agent_id: utility)
+        """
+        return OrderedDict((v[0], math.fabs(v[1].x)) for v in self.utility_vars.iteritems())
+
+    @property
+    def objective(self):
+        try:
+            return self.z.x
+        except gp.GurobiError:
+            return 0.
+
+    @property
+    def gap(self):
+        """
+        :return: Returns relative gap between the bounds on E[social welfare] (0 to 1, 1 without an upper bound).
+        """
+        if self.upper_bound == float('inf'):
+            return 1.
+        if self.upper_bound <= epsilon:
+            return 0.
+        return max(0., (self.upper_bound - self.lower_bound) / self.upper_bound)
+
+    def solve(self, time_budget=None, target_gap=None):
+        """
+        Solves until convergence or until a budget is exhausted. The returned lottery is always feasible, its \
+        E[social welfare] is lower_bound and no lottery exceeds upper_bound.
+        :param time_budget: Optional time budget in seconds.
+        :param target_gap: Optional relative gap (see gap) at which we are satisfied.
+        :return: Returns dict of Allocation.
+        """
+        for progress in self.progress(time_budget, target_gap):
+            pass
+        return self.expand(self.allocations)
+
+    def progress(self, time_budget=None, target_gap=None):
+        """
+        Same as solve, but yields a SolverProgress after each iteration.
+        :param time_budget: Optional time budget in seconds. An iteration is only started if it is expected to end \
+        within the budget, master solves get the time left as TimeLimit.
+        :param target_gap: Optional relative gap (see gap) at which we are satisfied.
+        """
+        start = time.time()
+        self.deadline = start + time_budget if time_budget is not None else None
+        self.converged = False
+        running = True
+        iteration_time = 0.
+        while running:
+            iteration_start = time.time()
+            # we do not start an iteration (assumed to take as long as the last one) that would exceed the budget
+            if self.deadline is not None and iteration_start + iteration_time > self.deadline:
+                self.stop()
+                running = False
+            else:
+                running = self.iterate()
+                iteration_time = time.time() - iteration_start
+                if running and target_gap is not None and self.gap <= target_gap:
+                    self.stop()
+                    running = False
+            lottery = self.expand(dict(item for item in self.allocations.iteritems() if item[1].probability > 0))
+            yield SolverProgress(self.iteration, self.lower_bound, self.upper_bound, self.gap, lottery,
+                                 time.time() - start)
+
+    def iterate(self):
+        """
+        Performs one iteration of the Bender Auction. Optimizes current master problem, requests an approximate \
+        allocation based on current prices and utilities, calculates phi with current optimal values of master problem \
+        and then compares this with current z value.
+        :return: False if auction is done and True if a Bender's cut has been added and the auction continues.
+        """
+        self.iteration += 1
+        iteration = self.iteration
+
+        self.log.log('')
+        self.log.log('######## ITERATION %s ########' % iteration)
+
+        speculations = self.speculate()
+        self.optimize()
+        if not self.solved:
+            # the budget ran out during the master solve, speculative answers are dropped
+            self.log.log('Out of time in iteration %s' % iteration)
+            self.finish()
+            return False
+        self.dual_history = (self.dual_history + [(self.prices, self.utilities)])[-2:]
+
+        # allocation := X
+        allocation = self.translate(self.approximator.approximate(self.price, self.utilities))
+        self.update_bounds(allocation)
+        phi = self.cut_value(allocation)
+        speculative_allocations = self.collect_speculations(speculations)
+
+        # check if phi with current result of master-problem is z (with tolerance)
+        if math.fabs(phi - self.z.x) < epsilon or iteration - self.iteration_offset > iteration_abort_threshold:
+                self.converged = math.fabs(phi - self.z.x) < epsilon
+                self.finish()
+                return False
+
+        # speculative allocations are only judged at the true master point
+        speculative_cuts = self.add_speculative_cuts(speculative_allocations, iteration)
+
+        name = self.allocation_names.get(allocation.key)
+        if name and self.m.getConstrByName(name) and speculative_cuts:
+            # the master changes through the speculative cuts, so there is no cycle
+            self.duplicates_skipped += 1
+            self.set_allocation_probabilities()
+            return True
+        if name and self.m.getConstrByName(name):
+            # the cut is there already, the master problem and with it the duals would stay the same
+            self.duplicates_skipped += 1
+            allocation = self.break_cycle()
+            if allocation is None:
+                self.log.log('Approximator cycles (%s), stopping with gap %.2f%%' % (self.on_cycle, 100. * self.gap))
+                self.finish()
+                return False
+            self.cycles_broken += 1
+            name = None
+        # otherwise continue and add cut based on this iteration's allocation (a dropped cut is added again)
+        allocation_name = name or 'X%s' % iteration
+        self.allocations[allocation_name] = allocation
+        self.add_benders_cut(allocation, allocation_name)
+        self.set_allocation_probabilities()
+        if self.checkpoint_path and iteration % self.checkpoint_interval == 0:
+            self.checkpoint(self.checkpoint_path)
+        return True
+
+    def cut_value(self, allocation):
+        """
+        :param allocation: Allocation X.
+        :return: Returns phi = w*b - (c + wA) * X at the current duals w (the right hand side of X's cut).
+        """
+        # first_term is w*b
+        first_term = sum([-w * b for w, b in zip(self.utilities.values() + self.prices.values(), self.b)])
+        # second_term is (c + wA) * X
+        second_term = 0
+        for assignment in allocation.assignments:
+            # for each x_ij which is 1 we generate c + wA which is (for MUA): v_i(j) + price * j + u_i in the non
+            # positive variables of add_benders_cut, i.e. v_i(j) - price * j - u_i in positive prices and utilities
+            # (times the number of class members receiving j)
+            second_term += -bundle_cost(self.price, assignment.quantity) * assignment.count
+            second_term += -self.utilities[assignment.agent_id] * assignment.count
+            second_term += assignment.valuation * assignment.count
+        phi = first_term - second_term
+        self.log.log('phi = %s - %s = %s' % (first_term, second_term, phi))
+        return phi
+
+    def speculate(self):
+        """
+        Starts threads asking the approximator at dual points the next master solve is predicted to reach. The \
+        prediction continues the step between the last two master solutions, k-th of n points goes k/n of the step \
+        beyond the last point.
+        :return: Returns list of (thread, result list), see collect_speculations.
+        """
+        if not self.speculation or len(self.dual_history) < 2:
+            return []
+        (old_prices, old_utilities), (prices, utilities) = self.dual_history
+
+        def predict(old, new, share):
+            return max(0., new + share * (new - old))
+
+        speculations = []
+        for k in range(1, self.speculation + 1):
+            share = float(k) / self.speculation
+            point = (self.price_point(OrderedDict((item, predict(old_prices[item], price, share))
+                                                  for item, price in prices.iteritems())),
+                     OrderedDict((agent_id, predict(old_utilities[agent_id], utility, share))
+                                 for agent_id, utility in utilities.iteritems()))
+            result = []
+            thread = threading.Thread(target=lambda point=point, result=result: result.append(
+                self.approximator.approximate(*point)))
+            thread.daemon = True
+            thread.start()
+            speculations.append((thread, result))
+        return speculations
+
+    def collect_speculations(self, speculations):
+        """
+        :param speculations: As returned by speculate.
+        :return: Returns list of speculative allocations (waits for all threads).
+        """
+        allocations = []
+        for thread, result in speculations:
+            thread.join()
+            self.speculative_calls += 1
+            allocations += [self.translate(allocation) for allocation in result]
+        return allocations
+
+    def add_speculative_cuts(self, allocations, iteration):
+        """
+        Adds the useful speculative allocations: new allocations whose cut is violated at the current master point. \
+        All others are dropped.
+        :param allocations: As returned by collect_speculations.
+        :param iteration: Current iteration (names the cuts).
+        :return: Returns number of cuts added.
+        """
+        added = 0
+        violated = [allocation for allocation in allocations if allocation.assignments and
+                    allocation.key not in self.allocation_names and self.cut_value(allocation) < self.z.x - epsilon]
+        for allocation in violated:
+            if allocation.key not in self.allocation_names:
+                name = 'P%s_%s' % (iteration, added)
+                self.allocations[name] = allocation
+                self.add_benders_cut(allocation, name)
+                self.speculative_hits += 1
+                added += 1
+        if added:
+            # the allocation of the true point is looked up among these cuts by name
+            self.m.update()
+        return added
+
+    @property
+    def speculation_hit_rate(self):
+        if not self.speculative_calls:
+            return 0.
+        return float(self.speculative_hits) / self.speculative_calls
+
+    def break_cycle(self):
+        """
+        Looks for an allocation whose cut is new and violated at the current duals, see on_cycle.
+        :return: Returns Allocation or None if there is none (or on_cycle is 'terminate').
+        """
+        if self.on_cycle == 'perturb':
+            rng = random.Random(self.iteration)
+
+            def perturb(value):
+                return max(0., value + rng.uniform(-1., 1.) * self.perturbation * max(value, 1.))
+            candidates = (self.approximator.approximate(
+                self.price_point(OrderedDict((item, perturb(price)) for item, price in self.prices.iteritems())),
+                OrderedDict((agent_id, perturb(utility)) for agent_id, utility in self.utilities.iteritems()))
+                          for attempt in range(0, self.perturbation_attempts))
+        elif self.on_cycle == 'switch' and self.items == [None]:
+            # any feasible allocation gives a valid cut, so b (scaled by our approximator's gap) stays untouched
+            other = NisanGreedyDemandApproximator if isinstance(self.approximator, LaviSwamyGreedyApproximator) \
+                else LaviSwamyGreedyApproximator
+            candidates = [other(self.supply, self.agents, BlackHoleLogger()).approximate(self.price, self.utilities)]
+        else:
+            # there is no other greedy approximator for bundles of several items
+            candidates = []
+
+        for allocation in candidates:
+            allocation = self.translate(allocation)
+            # only a feasible allocation gives a valid cut (Nisan's greedy may oversupply)
+            if allocation.fits(self.supply) and allocation.key not in self.allocation_names and \
+                    self.cut_value(allocation) < self.z.x - epsilon:
+                self.log.log('Cycle broken (%s)' % self.on_cycle)
+                return allocation
+        return None
+
+    def enable_checkpoints(self, path, interval=10):
+        """
+        Writes a snapshot (see checkpoint) every interval iterations and once the solve is done.
+        :param path: File to write.
+        :param interval: Number of iterations between snapshots.
+        """
+        self.checkpoint_path = path
+        self.checkpoint_interval = interval
+
+    def checkpoint(self, path):
+        """
+        Writes cuts (as allocation records), basis of the master problem, bounds and counters to path.
+        :param path: File to write.
+        """
+        self.m.update()
+        arrays = encode_allocations(self.allocations)
+        arrays['b'] = np.array(self.b, dtype=np.float64)
+        try:
+            arrays['variable_basis'] = np.array([v.VBasis for v in self.m.getVars()], dtype=np.int8)
+            arrays['constraint_basis'] = np.array([l.CBasis for l in self.m.getConstrs()], dtype=np.int8)
+        except gp.GurobiError:
+            # not optimized yet, there is no basis to keep
+            pass
+        meta = {'supply': self.supply,
+                'agent_ids': [agent.id for agent in self.agents],
+                'cuts': [l.ConstrName for l in self.m.getConstrs()],
+                'iteration': self.iteration,
+                'iteration_offset': self.iteration_offset,
+                'lower_bound': self.lower_bound,
+                'upper_bound': self.upper_bound,
+                'seed_names': self.seed_names,
+                'seed_time': self.seed_time,
+                'price_changed': self.price_changed,
+                'duplicates_skipped': self.duplicates_skipped,
+                'cycles_broken': self.cycles_broken,
+                'speculative_calls': self.speculative_calls,
+                'speculative_hits': self.speculative_hits}
+        write_snapshot(path, 'benders', meta, arrays)
+
+    def resume(self, path, warm_start=False):
+        """
+        Replaces the cuts of the master problem by the ones of a snapshot. Without warm_start the snapshot has to \
+        belong to this instance, then counters, bounds and basis are restored as well and iterating continues where \
+        the snapshot was taken. With warm_start the instance may differ (agents, valuations, supply): the allocations \
+        of the snapshot are revalued (see revalue_allocation) and added to the initial cuts of a fresh solve.
+        :param path: File written by checkpoint.
+        :param warm_start: If True the snapshot is only used for initial cuts.
+        """
+        meta, arrays = read_snapshot(path, 'benders')
+        allocations = decode_allocations(arrays)
+        if not warm_start and (meta['agent_ids'] != [agent.id for agent in self.agents] or
+                               meta['supply'] != self.supply or not np.allclose(arrays['b'], self.b)):
+            raise ValueError('%s belongs to another instance (use warm_start)' % path)
+
+        if warm_start:
+            agents_by_id = dict((agent.id, agent) for agent in self.agents)
+            added = 0
+            for index, name in enumerate(meta['cuts']):
+                allocation = revalue_allocation(allocations[name], agents_by_id, self.supply)
+                if allocation and allocation.key not in self.allocation_names:
+                    self.allocations['W%s' % index] = allocation
+                    self.add_benders_cut(allocation, 'W%s' % index)
+                    added += 1
+            self.m.update()
+            self.log.log('Warm start with %s of %s cuts from %s' % (added, len(meta['cuts']), path))
+            return
+
+        self.m.update()
+        for constraint in self.m.getConstrs():
+            self.m.remove(constraint)
+        self.allocations = dict(allocations)
+        self.allocation_names = dict((allocation.key, name) for name, allocation in allocations.iteritems())
+        for name in meta['cuts']:
+            self.add_benders_cut(allocations[name], name)
+        self.m.update()
+        if 'variable_basis' in arrays:
+            for variable, basis in zip(self.m.getVars(), arrays['variable_basis'].tolist()):
+                variable.VBasis = basis
+            for constraint, basis in zip(self.m.getConstrs(), arrays['constraint_basis'].tolist()):
+                constraint.CBasis = basis
+        self.iteration = meta['iteration']
+        self.iteration_offset = meta['iteration_offset']
+        self.lower_bound = meta['lower_bound']
+        self.upper_bound = meta['upper_bound']
+        self.seed_names = meta['seed_names']
+        self.seed_time = meta['seed_time']
+        self.price_changed = meta['price_changed']
+        # snapshots written before cycle detection do not count duplicates
+        self.duplicates_skipped = meta.get('duplicates_skipped', 0)
+        self.cycles_broken = meta.get('cycles_broken', 0)
+        self.speculative_calls = meta.get('speculative_calls', 0)
+        self.speculative_hits = meta.get('speculative_hits', 0)
+        self.log.log('Resumed at iteration %s from %s' % (self.iteration, path))
+
+    def set_supply(self, supply):
+        """
+        Changes the supply while keeping the master problem and all cuts. Only the last value of b depends on supply, \
+        so we only change the price coefficients of the cuts. Cuts of allocations exceeding the new supply are \
+        dropped, cuts removed after the last solve are added again. Agents screened for a smaller supply may win \
+        now, so they are screened again (see readmit).
+        :param supply: New supply (dict(item: supply) if there are several items).
+        """
+        if self.screen and self.screen.screened and supply > self.screen.supply:
+            self.readmit(supply)
+        # predictions from duals of another supply (and other agents) are of no use
+        self.dual_history = []
+        self.supply = supply
+        supplies = item_supply(supply)
+        self.b[-len(self.items):] = [supplies[item] / self.approximator.gap for item in self.items]
+        self.approximator.supply = supply
+        self.m.update()
+
+        for name, allocation in self.allocations.items():
+            constraint = self.m.getConstrByName(name)
+            if not allocation.fits(supply):
+                if constraint:
+                    self.m.remove(constraint)
+                del self.allocations[name]
+                del self.allocation_names[allocation.key]
+                if name in self.seed_names:
+                    self.seed_names.remove(name)
+            elif constraint:
+                # z <= wb - (c + wA) * X is stored as z - (b - q(X)) * price - ... <= -c * X (for every item)
+                quantities = allocation.quantities_assigned
+                for item, b in zip(self.items, self.b[-len(self.items):]):
+                    self.m.chgCoeff(constraint, self.price_vars[item], quantities.get(item, 0) - b)
+            else:
+                self.add_benders_cut(allocation, name)
+        self.m.update()
+
+        self.iteration_offset = self.iteration
+        self.lower_bound = 0.
+        self.upper_bound = float('inf')
+
+    def readmit(self, supply):
+        """
+        Screens all agents again for a larger supply (the LP price only drops as supply grows). Agents that may win \
+        now join the master problem: every cut gets their utility variable with coefficient b (none of the cuts \
+        assigns them anything).
+        :param supply: New supply (single item).
+        """
+        screen = BidderScreen(self.screen.agents + self.screen.screened, supply, self.log)
+        screened_ids = screen.screened_ids
+        readmitted = [agent for agent in self.screen.screened if agent.id not in screened_ids]
+        self.screen = screen
+        if not readmitted:
+            return
+        agents = self.preprocessor.extend(readmitted) if self.preprocessor else readmitted
+        agents = aggregate_agents(agents) if self.classes is not None else agents
+        # self.agents is the list of the approximator (and the classes if aggregating)
+        self.agents.extend(agents)
+
+        self.m.update()
+        constraints = self.m.getConstrs()
+        added = []
+        for agent in agents:
+            b = getattr(agent, 'multiplicity', 1) / self.approximator.gap
+            # b holds the agents first, then the items
+            self.b.insert(len(self.utility_vars), b)
+            self.utility_vars[agent.id] = self.m.addVar(lb=-gp.GRB.INFINITY, ub=0, name="u_%s" % agent.id)
+            added.append((self.utility_vars[agent.id], b))
+        self.m.update()
+        for variable, b in added:
+            for constraint in constraints:
+                # z <= wb - ... is stored as z - b * u_i - ... <= ...
+                self.m.chgCoeff(constraint, variable, -b)
+        self.m.update()
+        self.log.log('%s agents readmitted for supply %s' % (len(readmitted), supply))
+
+    def sweep_supply(self, supplies, time_budget=None, target_gap=None):
+        """
+        Solves for a sequence of supplies in one run, cuts found for one supply are reused for the next ones.
+        :param supplies: List of supplies.
+        :param time_budget: Optional time budget in seconds (per supply).
+        :param target_gap: Optional relative gap (per supply).
+        :return: Returns list of SweepPoint (welfare/price curve).
+        """
+        curve = []
+        for supply in supplies:
+            if supply != self.supply:
+                self.set_supply(supply)
+            allocations = self.solve(time_budget, target_gap)
+            curve.append(SweepPoint(supply, -self.objective, self.price, self.lower_bound, self.upper_bound,
+                                    allocations, self.iteration - self.iteration_offset))
+            self.log.log('Supply %s: E[Social welfare] %s at price %s' % (supply, -self.objective, self.price))
+        return curve
+
+    def seed(self, supply, points):
+        """
+        Inserts allocations found by the approximator at zero utilities and prices around an estimated clearing \
+        price as initial cuts, so the first iterations do not start from the empty allocation only. If all agents \
+        expose valuations, the clearing price is the exact LP price of LagrangianSolver and the allocation found at \
+        the optimal duals (price and utilities) is inserted as well.
+        :param supply: Supply up for auction.
+        :param points: Number of prices (between half and one and a half times the clearing price).
+        """
+        start = time.time()
+        lagrangian = self.lagrangian(supply)
+        clearing_price = lagrangian.price if lagrangian else self.estimate_clearing_price(supply)
+        prices = [clearing_price * (.5 + float(k) / (points - 1))
+                  if points > 1 else clearing_price for k in range(0, points)]
+        zero_utilities = OrderedDict((agent.id, 0.) for agent in self.agents)
+        dual_points = [(price, zero_utilities) for price in prices]
+        if lagrangian:
+            dual_points.insert(0, (lagrangian.price, lagrangian.utilities))
+
+        for price, utilities in dual_points:
+            allocation = self.translate(self.approximator.approximate(price, utilities))
+            # below the clearing price approximators summing independent demands (Nisan) may exceed supply
+            if allocation.assignments and allocation.fits(supply) and allocation.key not in self.allocation_names:
+                name = 'S%s' % len(self.seed_names)
+                self.seed_names.append(name)
+                self.allocations[name] = allocation
+                self.add_benders_cut(allocation, name)
+        self.seed_time = time.time() - start
+        self.log.log('Seeded %s cuts around clearing price %s' % (len(self.seed_names), clearing_price))
+
+    def lagrangian(self, supply):
+        """
+        :param supply: Supply up for auction.
+        :return: Returns LagrangianSolver over the solver's agents or None if an agent hides its valuations (or \
+        there are several items).
+        """
+        if self.items != [None] or any(not exposes_valuations(agent) for agent in self.agents):
+            return None
+        return LagrangianSolver(supply, self.agents)
+
+    def estimate_clearing_price(self, supply):
+        """
+        Estimates the clearing price by searching the smallest per-item value at which aggregated demand does not \
+        exceed supply (aggregated demand only changes at these breakpoints).
+        :param supply: Supply up for auction.
+        :return: Returns estimated clearing price.
+        """
+        breakpoints = sorted(set(float(valuation.valuation) / valuation.quantity for agent in self.agents
+                                 for valuation in getattr(agent, 'valuations', []) if valuation.quantity > 0))
+
+        def total_demand(price):
+            demands = zip(self.agents, gather_queries([(agent, 'query_demand', (price, supply, 0.))
+                                                       for agent in self.agents]))
+            return sum(demand.quantity * getattr(agent, 'multiplicity', 1) for agent, demand in demands if demand)
+
+        low, high = 0, len(breakpoints)
+        while low < high:
+            middle = (low + high) / 2
+            if total_demand(breakpoints[middle]) <= supply:
+                high = middle
+            else:
+                low = middle + 1
+        # without valuations to look at, we fall back to 0 (seeding at zero prices and utilities)
+        return breakpoints[min(low, len(breakpoints) - 1)] if breakpoints else 0.
+
+    def unseeded_iterations(self):
+        """
+        Solves the same economy (the solver's compressed agents or classes) without seeds in a master problem of its \
+        own.
+        :return: Returns number of iterations the unseeded solve needed.
+        """
+        solver = BendersSolver(self.supply, self.agents,
+                               type(self.approximator)(self.supply, self.agents, BlackHoleLogger()), BlackHoleLogger(),
+                               preprocess=False, aggregate=False, screen=False, on_cycle=self.on_cycle,
+                               perturbation=self.perturbation, perturbation_attempts=self.perturbation_attempts)
+        solver.solve()
+        solver.release()
+        return solver.iteration
+
+    @property
+    def iterations_saved(self):
+        """
+        :return: Returns iterations seeding saved compared to an unseeded solve (None unless seed_baseline).
+        """
+        if self.baseline_iterations is None:
+            return None
+        return self.baseline_iterations - (self.iteration - self.iteration_offset)
+
+    @property
+    def seeded_cuts_used(self):
+        """
+        :return: Returns number of seeded cuts in the current lottery (allocations the iterations did not have to \
+        find, which is not the same as iterations saved).
+        """
+        return len([name for name in self.seed_names if self.allocations[name].probability > 0])
+
+    def update_bounds(self, allocation):
+        """
+        The current lottery is feasible, so -z is a lower bound on E[social welfare]. The Lagrangian at the current \
+        (u, p) is an upper bound: sum(u)/alpha + p*supply/alpha + max_X (v(X) - u(X) - p*q(X)). As the approximator \
+        finds X up to its gap, gap * (v - u - p*q) of its allocation bounds the maximum. A heuristic approximator \
+        has no gap, the upper bound stays infinite.
+        :param allocation: Allocation found by approximator at current prices and utilities.
+        """
+        self.lower_bound = max(self.lower_bound, -self.objective)
+        if getattr(self.approximator, 'heuristic', False):
+            return
+        reduced_profit = sum((assignment.valuation - self.utilities[assignment.agent_id] -
+                              bundle_cost(self.price, assignment.quantity)) * assignment.count
+                             for assignment in allocation.assignments)
+        dual_objective = sum(w * b for w, b in zip(self.utilities.values() + self.prices.values(), self.b))
+        self.upper_bound = min(self.upper_bound,
+                               dual_objective + self.approximator.gap * max(0., reduced_profit))
+        self.log.log('%s <= E[Social welfare] <= %s' % (self.lower_bound, self.upper_bound))
+
+    def stop(self):
+        """
+        Stops before convergence, the master problem is optimized once more (within the time left) to make use of \
+        all cuts added so far.
+        """
+        self.optimize()
+        if self.solved:
+            self.lower_bound = max(self.lower_bound, -self.objective)
+        self.finish()
+
+    @property
+    def solved(self):
+        """
+        :return: Returns True if the last master solve finished (False if it hit the deadline).
+        """
+        return self.m.Status == gp.GRB.OPTIMAL
+
+    def finish(self):
+        # without a finished master solve the lottery of the last one is kept (probabilities are set after each)
+        if self.solved:
+            self.remove_bad_cuts()
+            self.set_allocation_probabilities()
+        if self.seed_baseline and self.seed_names and self.converged:
+            self.baseline_iterations = self.unseeded_iterations()
+        self.print_results()
+        if self.checkpoint_path:
+            self.checkpoint(self.checkpoint_path)
+
+    def release(self):
+        """
+        Returns the master problem to the model pool, prices, utilities and objective are no longer available.
+        """
+        model_pool().release(self.m)
+        self.m = None
+
+    def expand(self, allocations):
+        """
+        :param allocations: Dict of Allocation as used in master problem.
+        :return: Returns dict of Allocation over the single agents (see expand_allocations).
+        """
+        if self.classes:
+            return expand_allocations(allocations, self.classes)
+        return allocations
+
+    def translate(self, allocation):
+        """
+        :param allocation: Allocation as returned by approximator.
+        :return: Returns allocation with quantities mapped back to the bundles actually needed.
+        """
+        if self.preprocessor:
+            return self.preprocessor.translate(allocation)
+        return allocation
+
+    def add_price_constraint(self, new_price=None):
+        if True:
+            return None
+        try:
+            self.m.remove(self.m.getConstrByName("price_constraint"))
+        except gp.GurobiError:
+            pass
+
+        if new_price != None:
+            self.old_price_constraint = new_price
+        else:
+            self.old_price_constraint -= .5
+
+        self.log.log(self.old_price_constraint)
+        self.m.addConstr(self.price_var, gp.GRB.EQUAL, self.old_price_constraint, name="price_constraint")
+
+    def print_results(self):
+        """
+        Prints results in console.
+        """
+        self.log.log('')
+        self.log.log('####### SUMMARY #######')
+        self.log.log('')
+
+        self.m.write("master-program.lp")
+
+        for item in self.allocations.iteritems():
+            if item[1].probability > 0:
+                # noinspection PyArgumentList
+                self.log.log('%s (%s)' % (item[0], item[1].probability))
+                item[1].print_me(self.log)
+                self.log.log('')
+
+        if self.price_changed:
+            self.log.log('Price has decreased at some point.')
+        self.log.log('%s iterations needed' % (self.iteration - self.iteration_offset))
+        if self.seed_names:
+            self.log.log('Seeding took %.3fs, %s of %s seeded cuts are in the lottery' %
+                         (self.seed_time, self.seeded_cuts_used, len(self.seed_names)))
+        if self.iterations_saved is not None:
+            self.log.log('Seeding saved %s iterations (%s without seeds)' %
+                         (self.iterations_saved, self.baseline_iterations))
+        if self.speculative_calls:
+            self.log.log('Speculation: %s of %s speculative allocations added as cuts (%.1f%% hit rate)' %
+                         (self.speculative_hits, self.speculative_calls, 100. * self.speculation_hit_rate))
+        if self.duplicates_skipped:
+            self.log.log('%s known allocations skipped, %s cycles broken (%s)' %
+                         (self.duplicates_skipped, self.cycles_broken, self.on_cycle))
+        self.log.log('E[Social welfare] is %s' % (-self.objective if self.solved else self.lower_bound))
+        self.log.log('E[Social welfare] is at most %s (gap %.2f%%)' % (self.upper_bound, 100. * self.gap))
+
+    def optimize(self):
+        """
+        Optimizes current master-problem and outputs optimal values and dual variables
+        """
+        # for observation we save the current prices
+        current_prices = self.prices
+
+        self.m.params.TimeLimit = max(0., self.deadline - time.time()) if self.deadline is not None \
+            else gp.GRB.INFINITY
+        self.m.optimize()
+        if not self.solved:
+            return
+
+        if current_prices and any(current_prices[item] > price for item, price in self.prices.iteritems()):
+            self.price_changed = True
+
+        for v in [v for v in self.m.getVars() if v.x != 0.]:
+            self.log.log('%s %g' % (v.varName, v.x))
+
+        for l in self.m.getConstrs():
+            if l.Pi > 0:
+                self.log.log('%s %g' % (l.constrName, l.Pi))
+
+    def remove_bad_cuts(self):
+        for l in self.m.getConstrs():
+            if l.Pi == 0:
+                self.m.remove(l)
+
+    def add_benders_cut(self, allocation, name):
+        """
+        Adds another cut z <= wb - (c + wA) * X.
+        :param allocation: Allocation as list of Assignment.
+        :param name: Name for new constraint.
+        """
+        # wb part of cut
+        expr = gp.LinExpr(self.b, self.utility_vars.values() + self.price_vars.values())
+        for assignment in allocation.assignments:
+            # c (members of a class receiving the same bundle are one assignment with a count)
+            expr.addConstant(-assignment.valuation * assignment.count)
+            # if w=(u, p) then this is the uA part (for columns where X is 1)
+            expr.addTerms(-assignment.count, self.utility_vars[assignment.agent_id])
+            # if w=(u, p) then this is the pA part (for columns where X is 1), only items in the bundle have a term
+            for item, count in bundle_items(assignment.quantity):
+                expr.addTerms(-count * assignment.count, self.price_vars[item])
+            # we get v_i(j) + u_i + j * price summed over all i,j where x_ij = 1
+
+        self.m.addConstr(self.z, gp.GRB.LESS_EQUAL, expr, name=name)
+        self.allocation_names[allocation.key] = name
+
+    def set_allocation_probabilities(self):
+        for item in self.allocations.iteritems():
+            # noinspection PyArgumentList
+            constraint = self.m.getConstrByName(item[0])
+            item[1].probability = constraint.pi if constraint else 0
+
+
+class OptimalSolver:
+    def __init__(self, supply, agents, gap, restriced=False, preprocess=True, aggregate=True, screen=True):
+        """
+        :param supply: Supply up for auction or dict(item: supply), then there is a price constraint per item.
+        """
+        print ''
+        print 'Optimal Solver:'
+
+        agents = as_agents(agents)
+        # restricted solves give every bundle positive weight, so no agent may be dropped
+        self.screen = BidderScreen(agents, supply, ConsoleLogger()) if screen and not restriced else None
+        if self.screen:
+            agents = self.screen.agents
+        if preprocess:
+            self.preprocessor = ValuationPreprocessor(agents, ConsoleLogger())
+            agents = self.preprocessor.agents
+        if aggregate:
+            # x_c_j is the number of members of class c receiving j items
+            agents = aggregate_agents(agents)
+            print '%s classes' % len(agents)
+
+        # only bundles an agent actually bids on get a variable (any other bundle has coefficient 0)
+        keys = list(OrderedDict(((agent.id, valuation.quantity), getattr(agent, 'multiplicity', 1))
+                                for agent in agents for valuation in agent.valuations
+                                if fits(valuation.quantity, supply)).iteritems())
+        self.m, variables = model_pool().acquire("multi-unit-auction",
+                                                 [(0., ub, 'x_%s_%s' % (agent_id, bundle_name(quantity)))
+                                                  for (agent_id, quantity), ub in keys])
+        self.m.params.LogToConsole = 0
+        self.allocation_vars = dict((key, variable) for (key, ub), variable in zip(keys, variables))
+        quantities = dict((agent.id, [valuation.quantity for valuation in agent.valuations
+                                      if fits(valuation.quantity, supply)]) for agent in agents)
+
+        for agent in agents:
+            self.m.addConstr(gp.quicksum(self.allocation_vars[agent.id, i] for i in quantities[agent.id]), gp.GRB.LESS_EQUAL, getattr(agent, 'multiplicity', 1), name="u_%s" % agent.id)
+            if restriced:
+                for valuation in agent.valuations:
+                    if valuation.valuation > 0:
+                        self.m.addConstr(self.allocation_vars[agent.id, valuation.quantity] >= epsilon, name="not_zero_%s_%s" % (agent.id, bundle_name(valuation.quantity)))
+
+        # one supply constraint per item, a bundle only appears in the constraints of its items
+        supplies = item_supply(supply)
+        item_exprs = dict((item, gp.LinExpr()) for item in supplies)
+        for agent in agents:
+            for i in quantities[agent.id]:
+                for item, count in bundle_items(i):
+                    item_exprs[item].addTerms(count, self.allocation_vars[agent.id, i])
+        for item in sorted(supplies):
+            self.m.addConstr(item_exprs[item], gp.GRB.LESS_EQUAL, supplies[item],
+                             name="price" if item is None else "p_%s" % item)
+
+        obj_expr = gp.LinExpr()
+        for agent in agents:
+            for valuation in agent.valuations:
+                if fits(valuation.quantity, supply):
+                    obj_expr.addTerms(valuation.valuation, self.allocation_vars[agent.id, valuation.quantity])
+        self.m.setObjective(obj_expr, gp.GRB.MAXIMIZE)
+
+        self.m.update()
+
+        self.m.optimize()
+        #
+        # for agent in agents:
+        #     for i in range(1, supply + 1):
+        #         self.allocation_vars[agent.id, i] = self.m.addVar(vtype=gp.GRB.CONTINUOUS, lb=0,
+        #                                                           name='x_%s_%s' % (agent.id, i))
+        #
+        # self.m.update()
+        #
+        # self.m.addConstr(gp.quicksum(self.allocation_vars[agent.id, i] for i in range(1, supply + 1) for agent in agents),
+        #                  gp.GRB.LESS_EQUAL, supply / gap, name="price")
+        # for agent in agents:
+        #     for i in range(1, supply):
+        #         self.m.addConstr(self.allocation_vars[agent.id, i + 1] - self.allocation_vars[agent.id, i],
+        #                          gp.GRB.LESS_EQUAL, 0, name="chain_%s_%s" % (agent.id, i))
+        #         self.m.addConstr(self.allocation_vars[agent.id, i], gp.GRB.LESS_EQUAL, 1. / gap,
+        #                          name="p_%s_%s" % (agent.id, i))
+        #     self.m.addConstr(self.allocation_vars[agent.id, supply], gp.GRB.GREATER_EQUAL, 0, name="greater_%s" % agent.id)
+        #     self.m.addConstr(self.allocation_vars[agent.id, 1], gp.GRB.LESS_EQUAL, 1. / gap, name="u_%s" % agent.id)
+        #
+        # # m.addConstr(x11 + 2*x12 + 3*x13 + 4*x14 + x21 + 2*x22 + 3*x23 + 4*x24, gp.GRB.LESS_EQUAL, 4, name="p_an")
+        #
+        # obj_expr = gp.LinExpr()
+        # for agent in agents:
+        #     prev_val = None
+        #     for valuation in agent.valuations:
+        #         try:
+        #             prev_val = next(val for val in agent.valuations if val.quantity == valuation.quantity - 1)
+        #         except StopIteration:
+        #             pass
+        #         marginal_value = valuation.valuation - (prev_val.valuation if prev_val else 0)
+        #         obj_expr.addTerms(marginal_value, self.allocation_vars[agent.id, valuation.quantity])
+        # self.m.setObjective(obj_expr, gp.GRB.MAXIMIZE)
+        #
+        # self.m.optimize()
+
+        for v in [v for v in self.m.getVars() if v.x != 0.]:
+            print('%s %g' % (v.varName, v.x))
+
+        print ''
+        print 'CONSTRAINTS:'
+
+        for l in self.m.getConstrs():
+            if l.Pi > 0:
+                print('%s %g' % (l.constrName, l.Pi))
+
+        print self.m.getObjective().getValue()
+
+        # print 'Optimal solution:'
+        # for v in self.m.getVars():
+        #     print('%s %g' % (v.varName, v.x))
+        # for l in self.m.getConstrs():
+        #     if l.Pi > 0:
+        #         print('%s %g' % (l.constrName, l.Pi))
+        print 'OPT social welfare %s | %s/%s=%s' % (
+        self.m.getObjective().getValue(), self.m.getObjective().getValue(), gap,
+        self.m.getObjective().getValue() / gap)
+
+        self.m.write('optimal-lp.lp')
+        self.m.write('optimal-lp.sol')
+
+    def release(self):
+        """
+        Returns the model to the model pool.
+        """
+        model_pool().release(self.m)
+        self.m = None
+
+class NisanGreedyDemandApproximator:
+    def __init__(self, supply, agents, log, pool=None):
+        """
+        :param supply: Supply up for auction.
+        :param agents: List of Agent.
+        :param pool: Optional ShardedAgentPool holding the agents, demand is then queried in parallel.
+        """
+        self.supply = supply
+        self.agents = agents
+        self.log = log
+        self.pool = pool
+
+    @property
+    def gap(self):
+        return 2.
+
+    def approximate(self, price, utilities):
+        allocation = Allocation()
+        if self.pool:
+            demands = self.pool_demands(price)
+        else:
+            demands = gather_queries([(agent, 'query_demand', (price, self.supply, utilities[agent.id]))
+                                      for agent in self.agents])
+        for agent, demand in zip(self.agents, demands):
+            if demand:
+                # every member of an agent class demands the same
+                allocation.append(Assignment(demand.quantity, agent.id, demand.valuation,
+                                             getattr(agent, 'multiplicity', 1)))
+
+        allocation.print_me(self.log)
+
+        return allocation
+
+    def pool_demands(self, price):
+        """
+        :param price: Current price.
+        :return: Returns list of Valuation or None (demand of each agent), as query_demand would.
+        """
+        demand_round = self.pool.query_demands(price, self.supply)
+        demands = dict()
+        # we only look at agents with demand, everybody else is None
+        for i in np.flatnonzero(demand_round.quantities):
+            demands[self.pool.ids[i]] = Valuation(int(demand_round.quantities[i]), float(demand_round.values[i]))
+        return [demands.get(agent.id) for agent in self.agents]
+
+class LaviSwamyGreedyApproximator:
+    def __init__(self, supply, agents, log):
+        """
+        :param supply: Supply up for auction, a dict(item: supply) for several item types (agents bid on bundles, \
+        see allocate_bundles).
+        :param agents: List of Agent.
+        """
+        self.supply = supply
+        self.agents = agents
+        self.log = log
+
+    @property
+    def gap(self):
+        """
+        :return: Returns approximation gap for this algorithm. There is no proven gap relative to the LP for several \
+        item types, then 1 is returned (b is not scaled, see heuristic).
+        """
+        if self.heuristic:
+            return 1.
+        return 2.
+
+    @property
+    def heuristic(self):
+        """
+        :return: Returns True for several item types: allocate_bundles does not verify an integrality gap, so the \
+        lottery is feasible but not the scaled LP optimum Lavi & Swamy need for truthfulness in expectation.
+        """
+        return isinstance(self.supply, dict)
+
+    def approximate(self, price, utilities):
+        """
+        Approximates on current price and utilities vector
+        :param price: Current price (dict(item: price) for several item types).
+        :param utilities: Dict of utilities for each agent (agent_id being the key).
+        :return:
+        """
+        if isinstance(self.supply, dict):
+            allocation = self.allocate_bundles(self.agents, price, utilities)
+            allocation.print_me(self.log)
+            return allocation
+        allocation = self.allocate(self.agents[:], price, utilities)
+
+        allocation.print_me(self.log)
+
+        return allocation
+
+    def allocate(self, agents, price, utilities):
+        left_supply = self.supply
+        # members of an agent class holding the same quantity are interchangeable, so per class we only count how
+        # many members hold each quantity (an agent is a class with a single member) and ask once per quantity
+        holders = OrderedDict((agent.id, OrderedDict([(0, getattr(agent, 'multiplicity', 1))])) for agent in agents)
+        held_values = dict((agent.id, {0: 0.}) for agent in agents)
+        # as done in Lavi & Swamy 2005 mostly
+        margin = 0
+        while left_supply > 0 and left_supply - margin >= 0:
+            per_item_utilities = dict()
+            queries = OrderedDict(((agent.id, quantity), (agent, 'marginal_value_query', (margin, quantity)))
+                                  for agent in agents for quantity in holders[agent.id])
+            marginal_values = dict(zip(queries.keys(), gather_queries(queries.values())))
+
+            # ask each agent for his demand at current price.
+            for (agent_id, quantity), marginal_value in marginal_values.iteritems():
+                # if there is demand we add the agent's per_item_value to possible selection.
+                if marginal_value != None:
+                    # denominator is calculated with utility subtracted as it would have been done if we calculated
+                    # the c vector as done in Fadaei 2015
+                    marginal_utility = marginal_value - utilities[agent_id] - (quantity + margin) * price
+                    if marginal_utility > 0. and quantity + margin > 0:
+                        per_item_utilities[agent_id, quantity] = marginal_utility / (quantity + margin)
+
+            # if there was any demand we look for the agent with the maximal per-item-value
+            if per_item_utilities:
+                agent_id, quantity = max(per_item_utilities.iterkeys(), key=(lambda key: per_item_utilities[key]))
+
+                # we allocate the items to one member, therefore we remove these from the supply
+                left_supply -= margin
+                holders[agent_id][quantity] -= 1
+                if not holders[agent_id][quantity]:
+                    del holders[agent_id][quantity]
+                holders[agent_id][quantity + margin] = holders[agent_id].get(quantity + margin, 0) + 1
+                held_values[agent_id][quantity + margin] = held_values[agent_id][quantity] + \
+                    marginal_values[agent_id, quantity]
+            else:
+                margin += 1
+
+        assignments = [Assignment(quantity, agent_id, held_values[agent_id][quantity], count)
+                       for agent_id, held in holders.iteritems() for quantity, count in held.iteritems()
+                       if quantity > 0]
+        allocation = Allocation(assignments)
+        summed_valuations = sum(assignment.valuation * assignment.count for assignment in assignments)
+
+        # check if assigning all items to one agent is better
+        values = gather_queries([(agent, 'query_value', (self.supply,)) for agent in agents])
+        for agent, marginal_value in zip(agents, values):
+            if marginal_value.valuation - utilities[agent.id] - marginal_value.quantity * price > summed_valuations:
+                summed_valuations = marginal_value.valuation
+                allocation = Allocation([Assignment(self.supply, agent.id, marginal_value.valuation)])
+
+        return allocation
+
+    def allocate_bundles(self, agents, prices, utilities):
+        """
+        Greedy of allocate for bundles of several item types: a member holding a bundle (or nothing) may switch to \
+        any other bundle its agent demands. The switch of best marginal reduced value per share of the supply it \
+        adds (summed over the items) is taken while it fits, all members of a class holding the same bundle switch \
+        at once. The best single bundle is taken instead if it is worth more. Only demanded bundles are looked at, \
+        so a step costs as much as their nonzeros.
+        :param agents: List of BundleAgent (or classes of them).
+        :param prices: Dict(item: price).
+        :param utilities: Dict of utilities for each agent (agent_id being the key).
+        :return: Returns Allocation.
+        """
+        demands = gather_queries([(agent, 'query_bundle_demands', (prices, utilities[agent.id])) for agent in agents])
+        reduced_values = dict()
+        bids = dict()
+        for agent, valuations in zip(agents, demands):
+            bids[agent.id] = [valuation for valuation in valuations if fits(valuation.quantity, self.supply)]
+            for valuation in bids[agent.id]:
+                reduced_values[agent.id, valuation.quantity] = \
+                    valuation.valuation - utilities[agent.id] - bundle_cost(prices, valuation.quantity)
+        # per class we count how many members hold each bundle, the empty bundle () is worth nothing
+        holders = OrderedDict((agent.id, OrderedDict([((), getattr(agent, 'multiplicity', 1))])) for agent in agents)
+        left_supply = dict(self.supply)
+        while True:
+            best = None
+            for agent_id, held in holders.iteritems():
+                for bundle in held:
+                    owned = dict(bundle)
+                    for valuation in bids[agent_id]:
+                        gain = reduced_values[agent_id, valuation.quantity] - reduced_values.get((agent_id, bundle), 0.)
+                        added = [(item, count - owned.get(item, 0)) for item, count in valuation.quantity
+                                 if count > owned.get(item, 0)]
+                        if gain <= epsilon or any(count > left_supply[item] for item, count in added):
+                            continue
+                        share = sum(float(count) / self.supply[item] for item, count in added)
+                        density = gain / share if share else float('inf')
+                        if best is None or density > best[0]:
+                            best = (density, agent_id, bundle, valuation.quantity, added)
+            if best is None:
+                break
+            density, agent_id, bundle, quantity, added = best
+            # every member holding bundle may switch, as many as the supply allows
+            members = min([holders[agent_id][bundle]] + [left_supply[item] / count for item, count in added])
+            for item, count in bundle:
+                left_supply[item] += count * members
+            for item, count in quantity:
+                left_supply[item] -= count * members
+            holders[agent_id][bundle] -= members
+            if not holders[agent_id][bundle]:
+                del holders[agent_id][bundle]
+            holders[agent_id][quantity] = holders[agent_id].get(quantity, 0) + members
+
+        values = dict(((agent_id, valuation.quantity), valuation.valuation)
+                      for agent_id, valuations in bids.iteritems() for valuation in valuations)
+        assignments = [Assignment(bundle, agent_id, values[agent_id, bundle], count)
+                       for agent_id, held in holders.iteritems() for bundle, count in held.iteritems() if bundle]
+        allocation = Allocation(assignments)
+
+        # check if the best single bundle is better
+        if reduced_values:
+            (agent_id, quantity), reduced_value = max(reduced_values.iteritems(), key=lambda item: item[1])
+            if reduced_value > sum(reduced_values[assignment.agent_id, assignment.quantity] * assignment.count
+                                   for assignment in assignments):
+                allocation = Allocation([Assignment(quantity, agent_id, values[agent_id, quantity])])
+        return allocation
\ No newline at end of file
@@ -0,0 +1,293 @@
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from benders_auction.common import Valuation
+from benders_auction.population import exposes_valuations
+from benders_auction.remote import QUERY_METHODS, QueryFuture
+
+__author__ = 'Usiel'
+
+MAGIC = 'ORCTRACE'
+VERSION = 2
+HEADER = struct.Struct('<8sH')
+# method, kind of answer, agent id, up to three arguments, numeric answer, latency, number of valuations answered
+RECORD = struct.Struct('<BBqddddfH')
+# quantity and value of an answered valuation
+PAIR = struct.Struct('<qd')
+
+NONE, VALUATION, VALUATION_SET, NUMBER = range(0, 4)
+# method of records declaring an agent (agents are replayed in declaration order)
+AGENT = 255
+# method of records holding the valuations an agent exposes (replayed under the key ('valuations', ()))
+VALUATIONS = 254
+
+
+class TraceMiss(Exception):
+    pass
+
+
+class TraceRecorder:
+    def __init__(self, path):
+        """
+        TraceRecorder writes the queries of RecordingAgents to a binary trace. Records are appended under a lock, so \
+        agents may be asked from several threads.
+        :param path: File to write.
+        """
+        self.path = path
+        self.output = open(path, 'wb')
+        self.output.write(HEADER.pack(MAGIC, VERSION))
+        self.lock = threading.Lock()
+        self.records = 0
+
+    def register(self, agent_id, valuations=None):
+        """
+        :param agent_id: Integer identifier of an agent whose queries are recorded.
+        :param valuations: Optional list of Valuation the agent exposes.
+        """
+        record = RECORD.pack(AGENT, NONE, agent_id, 0., 0., 0., 0., 0., 0)
+        if valuations is not None:
+            record += RECORD.pack(VALUATIONS, VALUATION_SET, agent_id, 0., 0., 0., 0., 0., len(valuations))
+            record += ''.join(PAIR.pack(valuation.quantity, valuation.valuation) for valuation in valuations)
+        with self.lock:
+            self.output.write(record)
+
+    def write(self, agent_id, method, args, answer, latency):
+        """
+        :param agent_id: Integer identifier of the agent asked.
+        :param method: Query method (one of QUERY_METHODS).
+        :param args: Arguments of the query (at most three numbers).
+        :param answer: Answer (Valuation, set of Valuation, number or None).
+        :param latency: Seconds the agent needed to answer.
+        """
+        number = 0.
+        valuations = []
+        if answer is None:
+            kind = NONE
+        elif isinstance(answer, Valuation):
+            kind, valuations = VALUATION, [answer]
+        elif isinstance(answer, (set, list)):
+            kind, valuations = VALUATION_SET, sorted(answer, key=lambda valuation: valuation.quantity)
+        else:
+            kind, number = NUMBER, answer
+        args = list(args) + [0.] * (3 - len(args))
+        record = RECORD.pack(QUERY_METHODS.index(method), kind, agent_id, args[0], args[1], args[2], number,
+                             latency, len(valuations))
+        record += ''.join(PAIR.pack(valuation.quantity, valuation.valuation) for valuation in valuations)
+        with self.lock:
+            self.output.write(record)
+            self.records += 1
+
+    def close(self):
+        with self.lock:
+            self.output.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+
+class RecordedFuture:
+    def __init__(self, future, agent, method, args):
+        """
+        RecordedFuture records the answer of a submitted query once it is waited for. The latency is the time from \
+        submitting until the answer was there (or was asked for, if that was later).
+        :param future: QueryFuture of the wrapped agent.
+        :param agent: RecordingAgent which submitted the query.
+        :param method: Query method.
+        :param args: Arguments of the query.
+        """
+        self.future = future
+        self.agent = agent
+        self.method = method
+        self.args = args
+        self.start = time.time()
+        self.recorded = False
+
+    def result(self, timeout=None):
+        answer = self.future.result(timeout)
+        if not self.recorded:
+            self.recorded = True
+            self.agent.recorder.write(self.agent.id, self.method, self.args, answer, time.time() - self.start)
+        return answer
+
+
+class RecordingAgent:
+    # preprocessing keeps traced agents (see compress_agent), a compressed copy would answer without asking them
+    traced = True
+
+    def __init__(self, agent, recorder):
+        """
+        RecordingAgent passes every query on to agent and records question, answer and latency. Valuations and \
+        concurrent submission are forwarded as well (valuations are recorded once), so solvers take the same path \
+        (screening, aggregation, parallel queries) when recording, when replaying and without a trace. Only single \
+        item quantities fit a trace, bundles are rejected.
+        :param agent: Agent to wrap (integer id).
+        :param recorder: TraceRecorder.
+        """
+        self.agent = agent
+        self.id = agent.id
+        self.recorder = recorder
+        if exposes_valuations(agent):
+            self.valuations = list(agent.valuations)
+            if any(isinstance(valuation.quantity, tuple) for valuation in self.valuations):
+                raise ValueError('agent %s bids on bundles, traces only hold a single item' % self.id)
+            recorder.register(self.id, self.valuations)
+        else:
+            recorder.register(self.id)
+
+    @property
+    def concurrent(self):
+        return getattr(self.agent, 'concurrent', False)
+
+    def submit(self, method, *args):
+        """
+        :return: Returns future of the wrapped agent's answer, recorded once its result is asked for.
+        """
+        return RecordedFuture(self.agent.submit(method, *args), self, method, args)
+
+    def record(self, method, *args):
+        start = time.time()
+        answer = getattr(self.agent, method)(*args)
+        self.recorder.write(self.id, method, args, answer, time.time() - start)
+        return answer
+
+    def query_demand(self, price, left_supply, base_price):
+        return self.record('query_demand', price, left_supply, base_price)
+
+    def query_relative_demand(self, price, left_supply, base_price):
+        return self.record('query_relative_demand', price, left_supply, base_price)
+
+    def query_demand_set(self, price, left_supply):
+        return self.record('query_demand_set', price, left_supply)
+
+    def marginal_value_query(self, additional_quantity, quantity_owned):
+        return self.record('marginal_value_query', additional_quantity, quantity_owned)
+
+    def query_value(self, quantity):
+        return self.record('query_value', quantity)
+
+    def query_bundle_demands(self, prices, utility):
+        raise ValueError('agent %s was asked for bundles, traces only hold a single item' % self.id)
+
+
+def read_trace(path):
+    """
+    :param path: File written by TraceRecorder.
+    :return: Returns OrderedDict(agent_id: dict((method, args): list of (answer, latency))), agents in the order \
+    they were wrapped. Exposed valuations are found under ('valuations', ()) as list of Valuation.
+    """
+    with open(path, 'rb') as source:
+        data = source.read()
+    magic, version = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('%s is not a version %s oracle trace' % (path, VERSION))
+
+    answers = OrderedDict()
+    offset = HEADER.size
+    while offset < len(data):
+        method, kind, agent_id, first, second, third, number, latency, count = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if method == AGENT:
+            answers.setdefault(agent_id, dict())
+            continue
+        valuations = []
+        for i in range(0, count):
+            quantity, value = PAIR.unpack_from(data, offset)
+            valuations.append(Valuation(quantity, value))
+            offset += PAIR.size
+        if method == VALUATIONS:
+            answers.setdefault(agent_id, dict())[('valuations', ())] = [(valuations, 0.)]
+            continue
+        answer = {NONE: None, VALUATION: valuations[0] if valuations else None, VALUATION_SET: set(valuations),
+                  NUMBER: number}[kind]
+        method = QUERY_METHODS[method]
+        args = (first, second, third)[:argument_count(method)]
+        answers.setdefault(agent_id, dict()).setdefault((method, args), []).append((answer, latency))
+    return answers
+
+
+def argument_count(method):
+    return {'query_demand': 3, 'query_relative_demand': 3, 'query_demand_set': 2, 'marginal_value_query': 2,
+            'query_value': 1}[method]
+
+
+class ReplayAgent:
+    traced = True
+
+    def __init__(self, identifier, answers, latency=False):
+        """
+        ReplayAgent answers queries from a trace instead of asking anybody. Repeated questions get the recorded \
+        answers in recorded order (the last one once they are used up). It exposes valuations only if the recorded \
+        agent did.
+        :param identifier: Identifier of the recorded agent.
+        :param answers: Dict((method, args): list of (answer, latency)) as returned by read_trace for the agent.
+        :param latency: If True every answer takes as long as it took when recorded. Submitted queries (see \
+        gather_queries) then wait at the same time, like queries to remote agents.
+        """
+        self.id = identifier
+        self.answers = answers
+        self.latency = latency
+        self.asked = dict()
+        self.lock = threading.Lock()
+        if ('valuations', ()) in answers:
+            self.valuations = list(answers[('valuations', ())][0][0])
+
+    @property
+    def concurrent(self):
+        return self.latency
+
+    def lookup(self, method, *args):
+        """
+        :return: Returns (answer, latency) recorded for the next time this query is asked.
+        """
+        key = (method, tuple(float(arg) for arg in args))
+        if key not in self.answers:
+            raise TraceMiss('agent %s was never asked %s%s' % (self.id, method, args))
+        with self.lock:
+            index = self.asked.get(key, 0)
+            self.asked[key] = index + 1
+        answer, latency = self.answers[key][min(index, len(self.answers[key]) - 1)]
+        # callers may change the answers they get (e.g. sets), the trace keeps its own
+        return set(answer) if isinstance(answer, set) else answer, latency
+
+    def submit(self, method, *args):
+        answer, latency = self.lookup(method, *args)
+        future = QueryFuture(method)
+        timer = threading.Timer(latency if self.latency else 0., future.set_answer, [answer])
+        timer.daemon = True
+        timer.start()
+        return future
+
+    def replay(self, method, *args):
+        answer, latency = self.lookup(method, *args)
+        if self.latency:
+            time.sleep(latency)
+        return answer
+
+    def query_demand(self, price, left_supply, base_price):
+        return self.replay('query_demand', price, left_supply, base_price)
+
+    def query_relative_demand(self, price, left_supply, base_price):
+        return self.replay('query_relative_demand', price, left_supply, base_price)
+
+    def query_demand_set(self, price, left_supply):
+        return self.replay('query_demand_set', price, left_supply)
+
+    def marginal_value_query(self, additional_quantity, quantity_owned):
+        return self.replay('marginal_value_query', additional_quantity, quantity_owned)
+
+    def query_value(self, quantity):
+        return self.replay('query_value', quantity)
+
+
+def replay_agents(path, latency=False):
+    """
+    :param path: File written by TraceRecorder.
+    :param latency: If True answers take as long as they took when recorded.
+    :return: Returns list of ReplayAgent, one per recorded agent.
+    """
+    return [ReplayAgent(agent_id, answers, latency) for agent_id, answers in read_trace(path).iteritems()]
@@ -0,0 +1,79 @@
+import copy
+
+from benders_auction.agent import generate_randomized_agents, ManualAgent
+from benders_auction.auction import Auction, AscendingAuction, PrimalDualAuction
+from benders_auction.common import Valuation
+from benders_auction.solver import OptimalSolver
+
+__author__ = 'Usiel'
+
+# example used in paper
+agent1 = ManualAgent([Valuation(1, 10.), Valuation(2, 10.), Valuation(3, 10.), Valuation(4, 10.)], 1)
+agent2 = ManualAgent([Valuation(1, 10.), Valuation(2, 10.), Valuation(3, 10.), Valuation(4, 12.)], 2)
+agent3 = ManualAgent([Valuation(1, 10.), Valuation(2, 13.), Valuation(3, 14.), Valuation(4, 15.)], 3)
+auction_agents_m = [agent1, agent2, agent3]
+
+# automatically generated
+auction_supply = 9
+auction_agents = generate_randomized_agents(auction_supply, 5)
+a = Auction(auction_supply, auction_agents)
+
+a1 = ManualAgent([Valuation(1, 6.), Valuation(2, 6.), Valuation(3, 6.), Valuation(4, 9.)], 0)
+a2 = ManualAgent([Valuation(1, 1.), Valuation(2, 4.), Valuation(3, 4.), Valuation(4, 6.)], 1)
+agents_non_ascending = [a1]#, a2]
+
+agent1 = ManualAgent([Valuation(1, 6.), Valuation(2, 6.), Valuation(3, 6.), Valuation(4, 6.)], 0)
+agent2 = ManualAgent([Valuation(1, 1.), Valuation(2, 4.), Valuation(3, 4.), Valuation(4, 6.)], 1)
+#agent20 = ManualAgent([Valuation(1, 0.), Valuation(2, 2.), Valuation(3, 2.), Valuation(4, 2.)], 20)
+#agent200 = ManualAgent([Valuation(1, 1.), Valuation(2, ), Valuation(3, 4.5), Valuation(4, 4.5)], 200)
+#agent2000 = ManualAgent([Valuation(1, 0.), Valuation(2, 3.5), Valuation(3, 4.5), Valuation(4, 4.5)], 2000)
+agent3 = ManualAgent([Valuation(1, 0.), Valuation(2, 1.), Valuation(3, 1.), Valuation(4, 1.)], 2)
+auction_agents_m = [agent1, agent2, agent3]
+
+ausubel0 = ManualAgent(
+    [Valuation(1, 123.), Valuation(2, 236.), Valuation(3, 339.), Valuation(4, 339.), Valuation(5, 339.)], 0)
+ausubel1 = ManualAgent([Valuation(1, 75.), Valuation(2, 80.), Valuation(3, 83.), Valuation(4, 83.), Valuation(5, 83.)],
+                       1)
+ausubel2 = ManualAgent(
+    [Valuation(1, 125.), Valuation(2, 250.), Valuation(3, 299.), Valuation(4, 299.), Valuation(5, 299.)], 2)
+ausubel3 = ManualAgent(
+    [Valuation(1, 85.), Valuation(2, 150.), Valuation(3, 157.), Valuation(4, 157.), Valuation(5, 157.)], 3)
+ausubel4 = ManualAgent([Valuation(1, 45.), Valuation(2, 70.), Valuation(3, 75.), Valuation(4, 75.), Valuation(5, 75.)],
+                       4)
+
+ausubel_agents = [ausubel0, ausubel1, ausubel2, ausubel3, ausubel4]
+
+w1 = ManualAgent([Valuation(1, 0.), Valuation(2, 0.), Valuation(3, 3.)], 0)
+w2 = ManualAgent([Valuation(1, 2.), Valuation(2, 2.), Valuation(3, 2.)], 1)
+w_agents = [w1, w2]
+
+e1 = ManualAgent([Valuation(1, 0.), Valuation(2, 2.)], 0)
+e2 = ManualAgent([Valuation(1, 1.), Valuation(2, 1.)], 1)
+equi_agents = [e1, e2]
+
+a = agents_non_ascending
+supp = len(a[0].valuations)
+
+auction2 = Auction(supp, copy.deepcopy(a))
+auction = AscendingAuction(supp, a)
+pdauction = PrimalDualAuction(supp, a)
+
+sw = pdauction.start_auction()
+
+print''
+print '############### ASCENDING AUCTION'
+print''
+#sw = auction.start_auction()
+
+print''
+print '############### DW DECO AUCTION'
+print ''
+#auction2.start_auction()
+#
+# for agent in ag:
+# print agent.id
+# pprint.pprint(agent.cache.entries.keys())
+solver = OptimalSolver(supp, a, 2)
+opt_sw = solver.m.getObjective().getValue()
+if opt_sw != sw:
+    print 'OPT: %s | ASC_SW: %s' % (opt_sw, sw)
@@ -0,0 +1,43 @@
+from benders_auction.agent import ManualAgent
+from benders_auction.common import Valuation, ConsoleLogger
+from benders_auction.dw_solver import DwSolver
+from benders_auction.solver import OptimalSolver
+
+__author__ = 'Usiel'
+
+a1 = ManualAgent([Valuation(1, 6.), Valuation(2, 6.), Valuation(3, 6.), Valuation(4, 90.)], 0)
+a2 = ManualAgent([Valuation(1, 1.), Valuation(2, 4.), Valuation(3, 4.), Valuation(4, 6.)], 1)
+agents = [a1, a2]
+
+agent1 = ManualAgent([Valuation(1, 0.5), Valuation(2, 0.), Valuation(3, 0.), Valuation(4, 0.)], 0)
+agent2 = ManualAgent([Valuation(1, 0.), Valuation(2, 0.25), Valuation(3, 0.), Valuation(4, 0.25)], 1)
+agent3 = ManualAgent([Valuation(1, 0.), Valuation(2, 0.), Valuation(3, 0.), Valuation(4, 0.)], 2)
+auction_agents_m = [agent1, agent2, agent3]
+
+ausubel0 = ManualAgent([Valuation(1, 123.), Valuation(2, 236), Valuation(3, 339), Valuation(4, 339), Valuation(5, 339)], 0)
+ausubel1 = ManualAgent([Valuation(1, 75.), Valuation(2, 80), Valuation(3, 83), Valuation(4, 83), Valuation(5, 83)], 1)
+ausubel2 = ManualAgent([Valuation(1, 125.), Valuation(2, 250), Valuation(3, 299), Valuation(4, 299), Valuation(5, 299)], 2)
+ausubel3 = ManualAgent([Valuation(1, 85.), Valuation(2, 150), Valuation(3, 157), Valuation(4, 157), Valuation(5, 157)], 3)
+ausubel4 = ManualAgent([Valuation(1, 45.), Valuation(2, 70), Valuation(3, 75), Valuation(4, 75), Valuation(5, 75)], 4)
+
+ausubel_agents = [ausubel0, ausubel1, ausubel2, ausubel3, ausubel4]
+
+e1 = ManualAgent([Valuation(1, 0.), Valuation(2, 4./3.)], 0)
+e2 = ManualAgent([Valuation(1, 4./3.), Valuation(2, 0)], 1)
+equi_agents = [e1, e2]
+
+a = ausubel_agents
+supp = len(a[0].valuations)
+
+s = DwSolver(a, supp)
+while s.iterate():
+    pass
+s.set_allocation_probabilities()
+for item in s.allocations.iteritems():
+    if item[1].probability > 0 or True:
+        # noinspection PyArgumentList
+        print('%s (%s)' % (item[0], item[1].probability))
+        item[1].print_me(ConsoleLogger())
+        print ''
+
+OptimalSolver(supp, a, 2)
@@ -0,0 +1,64 @@
+from benders_auction.agent import ManualAgent
+from benders_auction.aggregation import AgentClass, aggregate_agents, expand_allocations
+from benders_auction.common import Valuation, Assignment, Allocation
+
+__author__ = 'Usiel'
+
+
+def make_class(first_id, members, value):
+    return AgentClass([ManualAgent([Valuation(1, value), Valuation(2, 2 * value)], first_id + member)
+                       for member in range(0, members)])
+
+
+def marginals(allocations):
+    """
+    :return: Returns dict(agent_id: probability of getting something).
+    """
+    probabilities = dict()
+    for allocation in allocations.itervalues():
+        for assignment in allocation.assignments:
+            probabilities[assignment.agent_id] = probabilities.get(assignment.agent_id, 0.) + allocation.probability
+    return probabilities
+
+
+def test_identical_agents_form_classes():
+    agents = [ManualAgent([Valuation(1, 3.)], 0), ManualAgent([Valuation(1, 3.)], 1),
+              ManualAgent([Valuation(1, 4.)], 2)]
+    classes = aggregate_agents(agents)
+    assert [agent_class.multiplicity for agent_class in classes] == [2, 1]
+    assert [member.id for member in classes[0].members] == [0, 1]
+
+
+def test_expansion_is_linear_in_class_sizes():
+    # coprime sizes would need their product (over a million) of allocations with a common rotation
+    classes = [make_class(0, 97, 1.), make_class(1000, 101, 2.), make_class(2000, 103, 3.)]
+    allocation = Allocation([Assignment(1, classes[0].id, 1., 3), Assignment(2, classes[1].id, 4., 5),
+                             Assignment(1, classes[2].id, 3., 2)], .5)
+    expanded = expand_allocations({'X1': allocation}, classes)
+    assert len(expanded) <= 97 + 101 + 103
+    assert abs(sum(allocation.probability for allocation in expanded.itervalues()) - .5) < 1e-12
+
+    # every member of a class gets the same share: count / multiplicity of the allocation's probability
+    probabilities = marginals(expanded)
+    for agent_class, count in zip(classes, [3, 5, 2]):
+        for member in agent_class.members:
+            assert abs(probabilities[member.id] - .5 * count / agent_class.multiplicity) < 1e-12
+    for expanded_allocation in expanded.itervalues():
+        assert expanded_allocation.quantity_assigned == 3 * 1 + 5 * 2 + 2 * 1
+        assert all(assignment.count == 1 for assignment in expanded_allocation.assignments)
+
+
+def test_welfare_is_kept():
+    classes = [make_class(0, 4, 1.), make_class(10, 6, 2.)]
+    allocations = {'X1': Allocation([Assignment(2, classes[0].id, 2., 3), Assignment(1, classes[1].id, 2., 1)], .25),
+                   'X2': Allocation([Assignment(1, classes[1].id, 2., 6)], .75)}
+    expanded = expand_allocations(allocations, classes)
+    assert abs(sum(allocation.expected_social_welfare for allocation in expanded.itervalues()) -
+               sum(allocation.expected_social_welfare for allocation in allocations.itervalues())) < 1e-12
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print '%s ok' % name
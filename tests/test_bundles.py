@@ -0,0 +1,70 @@
+from benders_auction.agent import BundleAgent
+from benders_auction.aggregation import aggregate_agents
+from benders_auction.auction import Auction
+from benders_auction.common import Valuation, BlackHoleLogger, make_bundle
+from benders_auction.portfolio import instance_features
+from benders_auction.solver import LaviSwamyGreedyApproximator
+
+__author__ = 'Usiel'
+
+
+def welfare(allocation):
+    return sum(assignment.valuation * assignment.count for assignment in allocation.assignments)
+
+
+def approximate(supply, agents):
+    approximator = LaviSwamyGreedyApproximator(supply, agents, BlackHoleLogger())
+    allocation = approximator.approximate(dict((item, 0.) for item in supply), dict((agent.id, 0.) for agent in agents))
+    assert allocation.fits(supply)
+    return allocation
+
+
+def test_several_items_are_heuristic():
+    approximator = LaviSwamyGreedyApproximator({'A': 2, 'B': 1}, [], BlackHoleLogger())
+    assert approximator.heuristic and approximator.gap == 1.
+    approximator = LaviSwamyGreedyApproximator(3, [], BlackHoleLogger())
+    assert not approximator.heuristic and approximator.gap == 2.
+
+
+def test_large_bundles_do_not_block_unit_bidders():
+    agents = [BundleAgent([Valuation(make_bundle({'A': 1}), 1.)], i) for i in range(100)] + \
+        [BundleAgent([Valuation(make_bundle({'A': 50}), 1.6)], 100 + i) for i in range(2)]
+    assert welfare(approximate({'A': 100}, agents)) == 100.
+
+
+def test_members_switch_to_larger_bundles():
+    agents = [BundleAgent([Valuation(make_bundle({'A': 1}), 1.), Valuation(make_bundle({'A': 10}), 9.)], i)
+              for i in range(10)]
+    assert welfare(approximate({'A': 100}, agents)) == 90.
+    classes = aggregate_agents(agents)
+    allocation = approximate({'A': 100}, classes)
+    assert len(classes) == 1
+    assert [(assignment.quantity, assignment.count) for assignment in allocation.assignments] == \
+        [(make_bundle({'A': 10}), 10)]
+
+
+def test_bundles_share_items():
+    agents = [BundleAgent([Valuation(make_bundle({'A': 1, 'B': 1}), 5.)], 0),
+              BundleAgent([Valuation(make_bundle({'A': 1}), 3.)], 1),
+              BundleAgent([Valuation(make_bundle({'B': 1}), 3.)], 2)]
+    assert welfare(approximate({'A': 1, 'B': 1}, agents)) == 6.
+
+
+def test_auction_refuses_several_items():
+    try:
+        Auction({'A': 1}, [BundleAgent([Valuation(make_bundle({'A': 1}), 1.)], 0)], BlackHoleLogger())
+    except ValueError:
+        return
+    assert False
+
+
+def test_features_of_several_items():
+    instance = {'supply': {'A': 3, 'B': 5}, 'agents': [{'id': 1, 'valuations': [[{'A': 1}, 2.]]}]}
+    assert instance_features(instance) == [0, 3, 3, 0, 2]
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print '%s ok' % name
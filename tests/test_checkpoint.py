@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+from benders_auction.agent import ManualAgent
+from benders_auction.aggregation import AgentClass
+from benders_auction.checkpoint import encode_allocations, decode_allocations, write_snapshot, read_snapshot, \
+    revalue_allocation
+from benders_auction.common import Valuation, Assignment, Allocation, make_bundle
+
+__author__ = 'Usiel'
+
+
+def described(allocations):
+    return dict((name, (allocation.probability, [(assignment.agent_id, assignment.quantity, assignment.valuation,
+                                                  assignment.count) for assignment in allocation.assignments]))
+                for name, allocation in allocations.iteritems())
+
+
+def test_snapshot_round_trip():
+    allocations = {'X0': Allocation([], 0.),
+                   'X1': Allocation([Assignment(2, 0, 5., 3), Assignment(1, 4, 2.)], .25)}
+    bundles = {'X1': Allocation([Assignment(make_bundle({'A': 2, 'B': 1}), 0, 5.)], 1.)}
+    path = tempfile.mktemp(suffix='.npz')
+    try:
+        for original in [allocations, bundles]:
+            write_snapshot(path, 'benders', {'iteration': 3}, encode_allocations(original))
+            meta, arrays = read_snapshot(path, 'benders')
+            assert meta['iteration'] == 3
+            assert described(decode_allocations(arrays)) == described(original)
+        try:
+            read_snapshot(path, 'dw')
+        except ValueError:
+            pass
+        else:
+            assert False
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_revalue_drops_what_is_gone():
+    members = [ManualAgent([Valuation(1, 3.), Valuation(2, 5.)], identifier) for identifier in range(0, 2)]
+    agents_by_id = {0: AgentClass(members), 5: ManualAgent([Valuation(1, 4.)], 5)}
+    allocation = Allocation([Assignment(2, 0, 1., 3), Assignment(1, 5, 1.), Assignment(1, 9, 7.)])
+    revalued = revalue_allocation(allocation, agents_by_id, 6)
+    # the class lost a member, agent 9 left, valuations are the current ones
+    assert [(assignment.agent_id, assignment.quantity, assignment.valuation, assignment.count)
+            for assignment in revalued.assignments] == [(0, 2, 5., 2), (5, 1, 4., 1)]
+    assert revalue_allocation(allocation, agents_by_id, 4) is None
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print '%s ok' % name
@@ -0,0 +1,67 @@
+import random
+
+from benders_auction.agent import ManualAgent
+from benders_auction.aggregation import aggregate_agents
+from benders_auction.common import Valuation
+from benders_auction.lagrangian import LagrangianSolver, demand_hull
+
+__author__ = 'Usiel'
+
+
+def random_agents(rng, count, supply):
+    agents = []
+    for identifier in range(0, count):
+        value = 0.
+        valuations = []
+        for quantity in range(1, supply + 1):
+            value += rng.randint(0, 6)
+            valuations.append(Valuation(quantity, value))
+        agents.append(ManualAgent(valuations, identifier))
+    return agents
+
+
+def test_unit_demands_clear_at_the_highest_losing_value():
+    agents = [ManualAgent([Valuation(1, value)], identifier) for identifier, value in enumerate([5., 3., 1.])]
+    solver = LagrangianSolver(2, agents)
+    assert solver.price == 1.
+    assert solver.objective == 8.
+    assert solver.allocation == {(0, 1): 1., (1, 1): 1.}
+
+
+def test_hull_drops_bundles_below_it():
+    quantities, values, slopes = demand_hull([Valuation(1, 2.), Valuation(2, 3.), Valuation(3, 6.)], 3)
+    assert quantities == [0, 3] and values == [0., 6.] and slopes == [2.]
+    # bundles above supply and bundles not worth more than smaller ones are cut off
+    quantities, values, slopes = demand_hull([Valuation(1, 4.), Valuation(2, 4.), Valuation(5, 9.)], 3)
+    assert quantities == [0, 1] and slopes == [4.]
+
+
+def test_strong_duality_on_random_economies():
+    rng = random.Random(3)
+    for trial in range(0, 200):
+        supply = rng.randint(1, 8)
+        solver = LagrangianSolver(supply, random_agents(rng, rng.randint(1, 6), supply))
+        assert abs(solver.objective - solver.primal_objective) < 1e-9
+        assert abs(solver.objective - solver.dual_objective(solver.price)) < 1e-9
+        # the price minimizes the dual, the allocation respects supply
+        for price in [solver.price * factor for factor in [0., .5, .9, 1.1, 2.]] + [rng.uniform(0, 10)]:
+            assert solver.dual_objective(price) >= solver.objective - 1e-9
+        assert sum(quantity * x for (agent_id, quantity), x in solver.allocation.iteritems()) <= supply + 1e-9
+
+
+def test_classes_solve_like_their_members():
+    rng = random.Random(5)
+    agents = random_agents(rng, 4, 5)
+    # every agent appears three times
+    copies = [ManualAgent(agent.valuations, 10 * copy + agent.id) for copy in range(0, 3) for agent in agents]
+    single = LagrangianSolver(5, copies)
+    aggregated = LagrangianSolver(5, aggregate_agents(copies))
+    assert abs(single.objective - aggregated.objective) < 1e-9
+    assert single.price == aggregated.price
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print '%s ok' % name
@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+from benders_auction.agent import ManualAgent
+from benders_auction.common import Valuation
+from benders_auction.population import generate_randomized_population, write_population, load_population, \
+    as_agents, agent_bids
+from benders_auction.preprocessing import CompressedAgent
+
+__author__ = 'Usiel'
+
+
+def round_trip(agents, supply, breakpoints):
+    path = tempfile.mktemp(suffix='.population')
+    try:
+        assert write_population(path, agents, supply, breakpoints) == len(agents)
+        population = load_population(path)
+        return [(agent.id, agent_bids(agent)) for agent in as_agents(population)], population.supply
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_dense_round_trip():
+    population = generate_randomized_population(6, 50, seed=4)
+    loaded, supply = round_trip(population, None, False)
+    assert supply == 6
+    assert loaded == [(agent.id, agent_bids(agent)) for agent in as_agents(population)]
+
+
+def test_breakpoint_round_trip_keeps_undominated_bundles():
+    agents = [ManualAgent([Valuation(1, 4.), Valuation(2, 4.), Valuation(3, 7.), Valuation(5, 9.)], 7),
+              ManualAgent([Valuation(2, 1.)], 8)]
+    loaded, supply = round_trip(agents, 4, True)
+    # bundles above supply are dropped, so are bundles worth no more than a smaller one (see CompressedAgent)
+    assert loaded == [(7, agent_bids(CompressedAgent(ManualAgent(agents[0].valuations[:3], 7)))), (8, ([2], [1.]))]
+
+
+def pair(valuation):
+    return (valuation.quantity, valuation.valuation) if valuation else None
+
+
+def test_population_agents_answer_like_manual_agents():
+    agents = as_agents(generate_randomized_population(5, 20, seed=9))
+    for agent in agents:
+        manual = ManualAgent([Valuation(quantity, value) for quantity, value in zip(*agent_bids(agent))], agent.id)
+        for price in [0., 2.5, 7., 30.]:
+            assert pair(agent.query_demand(price, 5, 0.)) == pair(manual.query_demand(price, 5, 0.))
+        assert pair(agent.query_value(3)) == pair(manual.query_value(3))
+    # answering from the arrays builds no Valuation lists
+    assert all(agent.valuation_list is None for agent in agents)
+
+
+def test_seeded_generation_is_reproducible():
+    first = generate_randomized_population(4, 10, seed=11)
+    second = generate_randomized_population(4, 10, seed=11)
+    assert (first.dense_values() == second.dense_values()).all()
+    assert not set(first.ids) & set(second.ids)
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print '%s ok' % name
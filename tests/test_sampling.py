@@ -0,0 +1,51 @@
+from benders_auction.backends import np
+from benders_auction.common import Assignment, Allocation
+from benders_auction.sampling import LotterySampler, alias_tables
+
+__author__ = 'Usiel'
+
+
+def test_tiny_probabilities_are_kept():
+    # an expanded class lottery splits its mass into many small pieces
+    allocations = dict(('X%s' % k, Allocation([Assignment(1, k, 1.)], .001)) for k in range(0, 1000))
+    sampler = LotterySampler(allocations, seed=1)
+    assert len([name for name in sampler.names if name is not None]) == 1000
+    assert all(sampler.draw_allocation().assignments for draw in range(0, 100))
+
+
+def test_missing_mass_goes_to_the_empty_allocation():
+    sampler = LotterySampler({'X1': Allocation([Assignment(2, 0, 5.)], .25)}, seed=2)
+    assert sampler.names == ['X1', None]
+    assert np.allclose(sampler.probabilities, [.25, .75])
+    # a total above 1 is scaled down
+    sampler = LotterySampler({'X1': Allocation([Assignment(1, 0, 1.)], .6),
+                              'X2': Allocation([Assignment(1, 1, 1.)], .6)}, seed=2)
+    assert np.allclose(sampler.probabilities, [.5, .5])
+
+
+def test_alias_tables_reproduce_probabilities():
+    probabilities = np.array([.5, .3, .15, .05])
+    probability_table, alias_table = alias_tables(probabilities)
+    count = len(probabilities)
+    reproduced = probability_table / count
+    for k in range(0, count):
+        reproduced[alias_table[k]] += (1. - probability_table[k]) / count
+    assert np.allclose(reproduced, probabilities)
+
+
+def test_realized_quantities_match_the_lottery():
+    allocations = {'X1': Allocation([Assignment(2, 0, 5.), Assignment(1, 1, 2., 3)], .4),
+                   'X2': Allocation([Assignment(1, 0, 3.)], .6)}
+    sampler = LotterySampler(allocations, seed=3)
+    quantities = sampler.realized_quantities(200000)
+    # class assignments count every member
+    assert abs(quantities[0].mean() - (.4 * 2 + .6 * 1)) < .01
+    assert abs(quantities[1].mean() - .4 * 3) < .01
+    assert abs(sampler.realized_welfare(200000).mean() - (.4 * 11. + .6 * 3.)) < .05
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print '%s ok' % name
@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+
+from benders_auction.agent import ManualAgent
+from benders_auction.backends import gp
+from benders_auction.common import Valuation, BlackHoleLogger
+from benders_auction.solution_cache import SolutionCache
+from benders_auction.solver import BendersSolver, LaviSwamyGreedyApproximator
+
+__author__ = 'Usiel'
+
+
+def make_solver(first_id, **options):
+    agents = [ManualAgent([Valuation(1, 6.), Valuation(2, 10.), Valuation(3, 11.)], first_id),
+              ManualAgent([Valuation(1, 4.), Valuation(2, 7.), Valuation(3, 9.)], first_id + 1)]
+    return BendersSolver(3, agents, LaviSwamyGreedyApproximator(3, agents, BlackHoleLogger()), BlackHoleLogger(),
+                         **options)
+
+
+def test_economies_are_found_again_under_other_ids():
+    directory = tempfile.mkdtemp()
+    try:
+        cache = SolutionCache(directory)
+        try:
+            solver = make_solver(0)
+        except gp.GurobiError as e:
+            print 'skipped, no LP solver (%s)' % e
+            return
+        allocations, welfare = cache.solve(solver)
+        assert solver.converged and cache.misses == 1
+        gap = solver.gap
+        solver.release()
+
+        renamed = make_solver(10)
+        cached, cached_welfare = cache.solve(renamed)
+        assert cache.hits == 1 and abs(cached_welfare - welfare) < 1e-9
+        assert renamed.gap == gap
+        assert set(assignment.agent_id for allocation in cached.itervalues()
+                   for assignment in allocation.assignments) <= {10, 11}
+        renamed.release()
+
+        # other solver options make another economy
+        default, other = make_solver(0), make_solver(0, on_cycle='perturb')
+        assert cache.key(other) != cache.key(default)
+        default.release()
+        other.release()
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_budgeted_solves_are_not_cached():
+    directory = tempfile.mkdtemp()
+    try:
+        cache = SolutionCache(directory)
+        try:
+            solver = make_solver(0)
+        except gp.GurobiError as e:
+            print 'skipped, no LP solver (%s)' % e
+            return
+        cache.solve(solver, time_budget=0.)
+        solver.release()
+        assert cache.hits == 0 and cache.misses == 0
+        solver = make_solver(0)
+        cache.solve(solver)
+        solver.release()
+        assert cache.misses == 1
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print '%s ok' % name
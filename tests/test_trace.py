@@ -0,0 +1,77 @@
+import os
+import tempfile
+
+from benders_auction.aggregation import aggregate_agents
+from benders_auction.agent import ManualAgent
+from benders_auction.backends import gp
+from benders_auction.common import Valuation, BlackHoleLogger
+from benders_auction.preprocessing import ValuationPreprocessor
+from benders_auction.solver import BendersSolver, LaviSwamyGreedyApproximator, NisanGreedyDemandApproximator
+from benders_auction.trace import TraceRecorder, RecordingAgent, read_trace, replay_agents
+
+__author__ = 'Usiel'
+
+
+def make_agents():
+    # agents 0 and 1 are identical (one class), agent 2 has a dominated bundle (compressed without a trace)
+    return [ManualAgent([Valuation(1, 6.), Valuation(2, 10.), Valuation(3, 11.)], 0),
+            ManualAgent([Valuation(1, 6.), Valuation(2, 10.), Valuation(3, 11.)], 1),
+            ManualAgent([Valuation(1, 4.), Valuation(2, 3.), Valuation(3, 9.)], 2)]
+
+
+
+def count_queries(path):
+    return sum(len(answers) for agent_answers in read_trace(path).itervalues()
+               for (method, args), answers in agent_answers.iteritems() if method != 'valuations')
+
+
+def approximate(agents, approximator):
+    agents = aggregate_agents(ValuationPreprocessor(agents).agents)
+    utilities = dict((agent.id, 0.) for agent in agents)
+    return approximator(3, agents, BlackHoleLogger()).approximate(1., utilities)
+
+
+def test_preprocessed_queries_are_recorded_and_replayed():
+    path = tempfile.mktemp(suffix='.trace')
+    try:
+        recorder = TraceRecorder(path)
+        agents = [RecordingAgent(agent, recorder) for agent in make_agents()]
+        recorded = [approximate(agents, approximator).key
+                    for approximator in [LaviSwamyGreedyApproximator, NisanGreedyDemandApproximator]]
+        recorder.close()
+        assert recorder.records > 0
+        assert count_queries(path) == recorder.records
+
+        replayed = [approximate(replay_agents(path), approximator).key
+                    for approximator in [LaviSwamyGreedyApproximator, NisanGreedyDemandApproximator]]
+        assert replayed == recorded
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_recorded_benders_solve_has_queries():
+    path = tempfile.mktemp(suffix='.trace')
+    try:
+        recorder = TraceRecorder(path)
+        agents = [RecordingAgent(agent, recorder) for agent in make_agents()]
+        try:
+            solver = BendersSolver(3, agents, LaviSwamyGreedyApproximator(3, agents, BlackHoleLogger()),
+                                   BlackHoleLogger())
+        except gp.GurobiError as e:
+            print 'skipped, no LP solver (%s)' % e
+            return
+        solver.solve()
+        solver.release()
+        recorder.close()
+        assert count_queries(path) > 0
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print '%s ok' % name